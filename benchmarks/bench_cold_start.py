@@ -0,0 +1,78 @@
+"""
+Mede a inicialização a frio do bot: um processo novo que importa `src.main`, carrega a
+configuração e monta o bot, até o ponto em que `bot.start` conectaria ao Discord.
+
+Cada rodada é um subprocesso, então o tempo inclui a inicialização do interpretador.
+Sai com código 1 se a mediana passar de `--budget` segundos, para acompanhar a meta
+de tempo de inicialização. `--eager` importa os SDKs dos provedores junto, como antes
+das importações sob demanda, para comparação. Para o detalhe por módulo, use
+`python -X importtime -c "import src.main"`; para as fases até o on_ready, rode o bot
+com STARTUP_PROFILE=1.
+
+Uso:
+    python -m benchmarks.bench_cold_start [--runs 10] [--budget 1.0] [--eager]
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+SDK_MODULES = ("httpx", "groq", "openai")
+
+SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+if {eager}:
+    import groq, openai, httpx
+import src.main
+imported = time.perf_counter()
+
+from src.utils.config import load_config
+from src.bot.client import create_bot
+create_bot(load_config())
+ready = time.perf_counter()
+
+print(json.dumps({{
+    "imports": imported - start,
+    "setup": ready - imported,
+    "sdks": [name for name in {sdks!r} if name in sys.modules]
+}}))
+"""
+
+def run_once(eager):
+    script = SCRIPT.format(eager=eager, sdks=SDK_MODULES)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    total = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total"] = total
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=1.0)
+    parser.add_argument("--eager", action="store_true")
+    args = parser.parse_args()
+
+    run_once(args.eager)  # aquece o cache de bytecode e do sistema de arquivos
+    results = [run_once(args.eager) for _ in range(args.runs)]
+
+    for key in ("imports", "setup", "total"):
+        values = sorted(result[key] for result in results)
+        print(f"{key:>8}: mediana {statistics.median(values) * 1000:7.1f} ms"
+              f" | mín {values[0] * 1000:7.1f} ms | máx {values[-1] * 1000:7.1f} ms")
+    print(f"SDKs carregados na inicialização: {', '.join(results[-1]['sdks']) or 'nenhum'}")
+
+    median = statistics.median(result["total"] for result in results)
+    if median > args.budget:
+        print(f"Acima da meta: {median:.3f} s > {args.budget:.3f} s")
+        sys.exit(1)
+    print(f"Dentro da meta: {median:.3f} s <= {args.budget:.3f} s")
+
+if __name__ == "__main__":
+    main()
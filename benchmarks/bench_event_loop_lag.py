@@ -0,0 +1,131 @@
+"""
+Mede o atraso do event loop enquanto várias menções concorrentes gravam no histórico.
+
+Compara o caminho antigo (sqlite3 síncrono, uma conexão e um commit por mensagem,
+executado direto no event loop) com o MessagePersistence assíncrono.
+
+Uso:
+    python -m benchmarks.bench_event_loop_lag [--channels 50] [--mentions 20]
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+from src.ai.message_store import MessageManager
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe_lag(samples, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def legacy_save(db_path, channel_id, message, max_messages):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    DELETE FROM channel_messages
+    WHERE channel_id = ?
+    AND timestamp NOT IN (
+        SELECT timestamp FROM channel_messages
+        WHERE channel_id = ?
+        ORDER BY timestamp DESC
+        LIMIT ?
+    )
+    ''', (channel_id, channel_id, max_messages))
+    cursor.execute('''
+    INSERT OR REPLACE INTO channel_messages
+    (channel_id, role, content, user_id, username, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (channel_id, message["role"], message["content"], message.get("user_id"),
+          message.get("username"), message["timestamp"]))
+    conn.commit()
+    conn.close()
+
+
+def legacy_setup(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS channel_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        user_id TEXT,
+        username TEXT,
+        timestamp REAL NOT NULL,
+        UNIQUE(channel_id, timestamp)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_channel_timestamp ON channel_messages(channel_id, timestamp)')
+    conn.commit()
+    conn.close()
+
+
+async def run_legacy(db_path, channels, mentions):
+    legacy_setup(db_path)
+
+    async def mention(channel_id, i):
+        for role in ("user", "assistant"):
+            message = {"role": role, "content": f"mensagem {i}", "user_id": "1",
+                       "username": "usuario", "timestamp": time.time()}
+            legacy_save(db_path, channel_id, message, 50)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(mention(str(c), i) for c in range(channels) for i in range(mentions)))
+
+
+async def run_async(db_path, channels, mentions):
+    manager = MessageManager(use_persistence=True, db_path=db_path)
+
+    async def mention(channel_id, i):
+        store = await manager.get_store(channel_id)
+        await store.add_user_message("1", "usuario", f"mensagem {i}")
+        await asyncio.sleep(0)
+        await store.add_assistant_message(f"resposta {i}")
+
+    await asyncio.gather(*(mention(str(c), i) for c in range(channels) for i in range(mentions)))
+    await manager.persistence.flush()
+    manager.close()
+
+
+async def measure(name, runner, db_path, channels, mentions):
+    samples = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(samples, stop))
+
+    start = time.perf_counter()
+    await runner(db_path, channels, mentions)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+
+    samples = samples or [0.0]
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:>8}: total {elapsed * 1000:8.1f} ms | lag médio {statistics.mean(samples) * 1000:6.2f} ms"
+          f" | p99 {p99 * 1000:6.2f} ms | máx {samples[-1] * 1000:6.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--mentions", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await measure("antes", run_legacy, os.path.join(tmp, "legacy.db"), args.channels, args.mentions)
+        await measure("depois", run_async, os.path.join(tmp, "async.db"), args.channels, args.mentions)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Compara a remoção de um servidor com muitos canais limpando canal por canal (um
+`clear_store` por canal, como antes) com `purge_guild`, que usa o índice servidor →
+canais e apaga memória e banco em uma única passagem.
+
+A segunda medição de `purge_guild` simula um banco anterior à coluna `guild_id`
+(todas as linhas com `guild_id` nulo), em que a lista de canais do servidor é apagada
+por uma única instrução sobre uma tabela temporária. A terceira recarrega os canais
+pela hidratação "eager", como em um reinício do bot, e apaga o servidor sem passar a
+lista de canais: os armazenamentos hidratados precisam sair da memória só pelo índice
+servidor → canais.
+
+Uso:
+    python -m benchmarks.bench_guild_purge [--channels 5000] [--messages 20]
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+
+from src.ai.message_store import MessageManager
+from src.utils.config import get_config
+
+GUILD_ID = "900000000000000000"
+
+async def populate(db_path, channels, messages, legacy=False, hydrated=False):
+    manager = MessageManager(use_persistence=True, db_path=db_path)
+
+    channel_ids = [str(100000000000000000 + i) for i in range(channels)]
+    for channel_id in channel_ids:
+        store = await manager.get_store(channel_id, GUILD_ID)
+        for i in range(messages):
+            await store.add_user_message("1", "usuario", f"mensagem {i}")
+    await manager.persistence.flush()
+
+    if legacy:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE channel_messages SET guild_id = NULL")
+
+    if hydrated:
+        manager.close()
+        config = get_config()
+        config.history_hydration = "eager"
+        config.store_max_resident = 0
+        manager = MessageManager(use_persistence=True, db_path=db_path)
+        await manager.hydrate()
+    return manager, channel_ids
+
+async def per_channel(manager, channel_ids):
+    for channel_id in channel_ids:
+        await manager.clear_store(channel_id)
+
+async def one_pass(manager, channel_ids):
+    await manager.purge_guild(GUILD_ID, channel_ids)
+
+async def by_index(manager, channel_ids):
+    await manager.purge_guild(GUILD_ID, [])
+
+async def measure(name, purge, channels, messages, legacy=False, hydrated=False):
+    with tempfile.TemporaryDirectory() as directory:
+        manager, channel_ids = await populate(
+            os.path.join(directory, "messages.db"), channels, messages, legacy, hydrated
+        )
+
+        start = time.perf_counter()
+        await purge(manager, channel_ids)
+        elapsed = time.perf_counter() - start
+
+        remaining = await manager.persistence.load_recent(messages)
+        print(f"{name:>23}: {elapsed * 1000:9.1f} ms | {len(manager.stores)} em memória"
+              f" | {len(remaining)} canais no banco")
+        manager.close()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--channels", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    await measure("por canal", per_channel, args.channels, args.messages)
+    await measure("purge_guild", one_pass, args.channels, args.messages)
+    await measure("purge_guild (legado)", one_pass, args.channels, args.messages, legacy=True)
+    await measure("purge_guild (hidratado)", by_index, args.channels, args.messages, hydrated=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Mede o custo de uma chamada de log na thread que loga (o event loop, no caminho do
+on_message), com os três sinks do bot ligados.
+
+Compara a configuração anterior (sinks síncronos com diagnose, e o sink JSON abrindo e
+fechando o arquivo a cada registro) com os sinks com fila e thread de escrita. A saída
+do console vai para /dev/null nos dois casos.
+
+Uso:
+    python -m benchmarks.bench_log_call [--calls 5000] [--rounds 10]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from loguru import logger
+
+from src.utils.logger import (
+    DEFAULT_LOG_FORMAT, BufferedStreamSink, RotatingFileSink, _render_json, _json_notice
+)
+
+
+class LegacyJsonSink:
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def write(self, message):
+        record = message.record
+        log_entry = {
+            "timestamp": record["time"].strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "level": record["level"].name,
+            "module": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+            "process_id": record["process"].id,
+            "thread_id": record["thread"].id
+        }
+        if record["extra"]:
+            log_entry["extra"] = record["extra"]
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(log_entry) + "\n")
+
+
+def legacy_sinks(directory, console):
+    logger.add(console, format=DEFAULT_LOG_FORMAT, colorize=True, backtrace=True, diagnose=True)
+    logger.add(directory / "bot.log", format=DEFAULT_LOG_FORMAT, rotation="10 MB", retention=5,
+               compression="zip", backtrace=True, diagnose=True)
+    logger.add(LegacyJsonSink(str(directory / "bot.json")), serialize=True)
+
+
+def buffered_sinks(directory, console):
+    logger.add(BufferedStreamSink(console), format=DEFAULT_LOG_FORMAT, colorize=True,
+               backtrace=True, diagnose=False)
+    logger.add(RotatingFileSink(directory, "bot", ".log", compress=True), format=DEFAULT_LOG_FORMAT,
+               colorize=False, backtrace=True, diagnose=False)
+    logger.add(RotatingFileSink(directory, "bot", ".json", render=_render_json, notice=_json_notice),
+               format="{message}", backtrace=False, diagnose=False)
+
+
+def measure(name, configure, calls, rounds):
+    log = logger.bind(name="src.bot.client")
+    samples = []
+
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as console:
+        logger.remove()
+        configure(Path(directory), console)
+
+        for _ in range(rounds):
+            for i in range(calls):
+                start = time.perf_counter()
+                log.info(f"Menção recebida no canal {i} de usuario_{i % 100}")
+                samples.append(time.perf_counter() - start)
+            # Intervalo entre rajadas, como entre mensagens do Discord.
+            time.sleep(0.2)
+
+        # remove() espera as threads de escrita esvaziarem a fila.
+        start = time.perf_counter()
+        logger.remove()
+        drain = time.perf_counter() - start
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99)]
+    print(f"{name:>10}: mediana {statistics.median(samples) * 1e6:6.1f} µs | p99 {p99 * 1e6:7.1f} µs"
+          f" | máx {samples[-1] * 1e6:8.1f} µs | esvaziar a fila {drain * 1000:5.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    # Rajadas menores que a fila (log_queue_size), para medir o custo da chamada e não o
+    # da política de descarte.
+    measure("síncrono", legacy_sinks, args.calls, args.rounds)
+    measure("com fila", buffered_sinks, args.calls, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compara a memória residente do histórico em dicionários (formato antigo) com a dos
+MessageRecord com __slots__ e campos internados.
+
+Simula o carregamento do banco de dados: cada mensagem chega com strings novas para
+papel, ID e nome do usuário, como acontece ao ler as linhas do SQLite.
+
+Uso:
+    python -m benchmarks.bench_message_memory [--channels 10000] [--messages 50] [--users 2000]
+"""
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from collections import deque
+
+from src.ai.message_store import MessageStore
+from src.ai.message_record import MessageRecord
+
+
+def make_rows(rng, messages, users):
+    rows = []
+    for i in range(messages):
+        user = rng.randrange(users)
+        role = "user" if i % 2 == 0 else "assistant"
+        content = f"mensagem {i} " + "x" * rng.randrange(40, 200)
+        # Strings construídas em tempo de execução, como as que o sqlite3 devolve.
+        rows.append(("".join(role), content,
+                     str(100000000000000000 + user) if role == "user" else None,
+                     f"usuario_{user}" if role == "user" else None,
+                     time.time()))
+    return rows
+
+
+def legacy_store(rows, max_messages):
+    """
+    Formato anterior: um dicionário por mensagem e um prompt paralelo com
+    (mensagem formatada, tokens).
+    """
+    messages = deque(maxlen=max_messages)
+    prompt = deque(maxlen=max_messages)
+    for role, content, user_id, username, timestamp in rows:
+        message = {"role": role, "content": content, "timestamp": timestamp}
+        if user_id:
+            message["user_id"] = user_id
+        if username:
+            message["username"] = username
+        messages.append(message)
+
+        text = f"{username}: {content}" if role == "user" else content
+        prompt.append(({"role": role, "content": text}, len(text) // 3 + 4))
+    return messages, prompt
+
+
+def record_store(rows, max_messages):
+    store = MessageStore(max_messages=max_messages)
+    store.restore([MessageRecord(role, content, timestamp, user_id, username)
+                   for role, content, user_id, username, timestamp in rows])
+    return store
+
+
+def measure(name, build, channel_rows, max_messages):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    stores = [build(rows, max_messages) for rows in channel_rows]
+
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(len(rows) for rows in channel_rows)
+    print(f"{name:>8}: {current / 2**20:8.1f} MiB | {current / total:6.0f} B/mensagem"
+          f" | {current / len(channel_rows):8.0f} B/canal | {elapsed:5.2f} s")
+    return stores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--channels", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    channel_rows = [make_rows(rng, args.messages, args.users) for _ in range(args.channels)]
+
+    # O conteúdo das mensagens existe nos dois formatos; a diferença medida é o que o
+    # armazenamento acrescenta por cima dele.
+    legacy = measure("dict", legacy_store, channel_rows, args.messages)
+    del legacy
+    records = measure("slots", record_store, channel_rows, args.messages)
+    del records
+
+
+if __name__ == "__main__":
+    main()
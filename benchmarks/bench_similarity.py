@@ -0,0 +1,124 @@
+"""
+Mede a latência de consulta e a memória do cache de perguntas parecidas.
+
+Antes, confere um conjunto fixo de casos: variantes da mesma pergunta (abreviações,
+sem acentos, caixa e pontuação diferentes) precisam ser servidas do cache e perguntas
+sobre outro assunto não. Sai com código 1 se algum caso falhar.
+
+Depois preenche o índice com perguntas sintéticas e consulta variantes (com erros de
+digitação, sem acentos e com pontuação diferente) e perguntas novas.
+
+Uso:
+    python -m benchmarks.bench_similarity [--entries 100000] [--queries 2000]
+"""
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+from src.ai.similarity import SimilarityCache
+
+TOPICS = ["python", "discord", "eleição", "orçamento", "futebol", "reforma tributária", "inflação",
+          "saúde pública", "educação", "segurança", "transporte", "energia solar", "imposto de renda"]
+TEMPLATES = ["o que é {}?", "como funciona {}?", "qual sua opinião sobre {}?", "me explica {} {}",
+             "por que {} está assim?", "quem inventou {}?", "{} é bom ou ruim?"]
+
+# (pergunta guardada, pergunta feita, deve ser servida do cache)
+CASES = [
+    ("o que é inflação?", "oq é inflação?", True),
+    ("o que é inflação?", "O QUE E INFLACAO??", True),
+    ("o que é inflação?", "o que é inflaçao", True),
+    ("como funciona a reforma tributária?", "como funciona reforma tributaria", True),
+    ("você acha que o bolsonaro ganha?", "vc acha q o bolsonaro ganha", True),
+    ("por que o dólar está subindo?", "pq o dolar ta subindo?", True),
+    ("qual sua opinião sobre energia solar?", "qual a sua opinião sobre energia solar", True),
+    ("o que é inflação?", "o que é deflação?", False),
+    ("o que é inflação?", "o que é python?", False),
+    ("como funciona a reforma tributária?", "como funciona o imposto de renda?", False),
+    ("qual sua opinião sobre energia solar?", "qual sua opinião sobre energia nuclear?", False),
+    ("quem inventou o futebol?", "quem inventou o python?", False),
+    ("oi", "oi", False),
+]
+
+
+def check_cases(threshold):
+    failures = 0
+    for stored, asked, expected in CASES:
+        cache = SimilarityCache()
+        cache.add("canal", stored, "resposta")
+        hit = cache.lookup("canal", asked, threshold) is not None
+        if hit != expected:
+            failures += 1
+            print(f"FALHOU: {asked!r} {'serviu' if hit else 'não serviu'} a resposta de {stored!r}")
+    print(f"casos: {len(CASES) - failures}/{len(CASES)} corretos")
+    return failures == 0
+
+
+def make_question(rng, i):
+    template = rng.choice(TEMPLATES)
+    topic = rng.choice(TOPICS)
+    return template.format(topic, i) if template.count("{}") == 2 else f"{template.format(topic)} #{i}"
+
+
+def mutate(rng, text):
+    chars = list(text.upper() if rng.random() < 0.3 else text)
+    if len(chars) > 4:
+        del chars[rng.randrange(len(chars))]
+    return "".join(chars).replace("?", "??")
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--scopes", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    if not check_cases(args.threshold):
+        sys.exit(1)
+
+    rng = random.Random(42)
+    cache = SimilarityCache(max_entries=args.entries)
+    questions = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(args.entries):
+        scope = f"canal{i % args.scopes}"
+        question = make_question(rng, i)
+        questions.append((scope, question))
+        cache.add(scope, question, f"resposta {i}")
+    insert_time = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    hits = 0
+    for i in range(args.queries):
+        if i % 2 == 0:
+            scope, question = rng.choice(questions)
+            question = mutate(rng, question)
+        else:
+            scope, question = f"canal{rng.randrange(args.scopes)}", f"pergunta inédita número {i} sobre nada"
+
+        start = time.perf_counter()
+        if cache.lookup(scope, question, args.threshold) is not None:
+            hits += 1
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"entradas: {len(cache)} | inserção: {insert_time / args.entries * 1e6:.1f} µs/entrada"
+          f" | memória: {memory / 1024 / 1024:.1f} MiB ({memory / len(cache):.0f} B/entrada)")
+    print(f"consultas: {args.queries} | acertos: {hits}"
+          f" | p50 {percentile(latencies, 0.5) * 1e6:.0f} µs | p99 {percentile(latencies, 0.99) * 1e6:.0f} µs"
+          f" | máx {latencies[-1] * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
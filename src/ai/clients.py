@@ -0,0 +1,129 @@
+import os
+import asyncio
+import importlib
+from typing import TYPE_CHECKING, Optional
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+if TYPE_CHECKING:
+    import httpx
+    import groq
+    from openai import AsyncOpenAI
+
+logger = get_logger(__name__)
+
+# Os SDKs dos provedores levam meio segundo para importar; ficam fora do caminho da
+# inicialização e são carregados em uma thread (preload) ou no primeiro uso.
+SDK_MODULES = ("httpx", "groq", "openai")
+
+class ProviderClients:
+    """
+    Registro dos clientes de IA compartilhados pelo bot.
+
+    Cada provedor ganha um único cliente, com seu próprio pool de conexões HTTP
+    keep-alive, criado na primeira utilização e fechado no encerramento do bot. As
+    repetições automáticas dos SDKs ficam desligadas; quem repete é `src.ai.retry`.
+    """
+    def __init__(self):
+        self._groq: Optional["groq.AsyncClient"] = None
+        self._openai: Optional["AsyncOpenAI"] = None
+        self._warmed_up = False
+        self._preload: Optional[asyncio.Task] = None
+
+    def _create_http_client(self) -> "httpx.AsyncClient":
+        import httpx
+
+        config = get_config()
+        limits = httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry
+        )
+        return httpx.AsyncClient(limits=limits, timeout=config.response_timeout)
+
+    def get_groq(self) -> "groq.AsyncClient":
+        if self._groq is None:
+            import groq
+
+            api_key = os.getenv("GROQ_API_KEY")
+
+            if not api_key:
+                raise ValueError("GROQ_API_KEY não encontrada nas variáveis de ambiente")
+
+            self._groq = groq.AsyncClient(api_key=api_key, http_client=self._create_http_client(), max_retries=0)
+            logger.info("Cliente Groq criado")
+
+        return self._groq
+
+    def get_openai(self) -> "AsyncOpenAI":
+        if self._openai is None:
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv("OPENAI_API_KEY")
+
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY não encontrada nas variáveis de ambiente")
+
+            self._openai = AsyncOpenAI(api_key=api_key, http_client=self._create_http_client(), max_retries=0)
+            logger.info("Cliente OpenAI criado")
+
+        return self._openai
+
+    def preload(self, open_connections: bool = True) -> None:
+        """
+        Importa os SDKs em uma thread, sem bloquear o event loop, e em seguida abre as
+        conexões se `open_connections` for verdadeiro. Roda em segundo plano.
+        """
+        if self._preload is None:
+            self._preload = asyncio.create_task(self._run_preload(open_connections))
+
+    async def _run_preload(self, open_connections: bool) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [importlib.import_module(name) for name in SDK_MODULES]
+        )
+        logger.debug("SDKs dos provedores de IA carregados")
+
+        if open_connections:
+            await self.warmup()
+
+    async def warmup(self) -> None:
+        """
+        Abre as conexões com os provedores antes da primeira menção, para que a
+        primeira resposta não pague o handshake TCP+TLS.
+        """
+        if self._warmed_up:
+            return
+        self._warmed_up = True
+
+        async def _warm(name, get_client):
+            try:
+                await get_client().models.list()
+                logger.info(f"Conexão com {name} pré-aquecida")
+            except Exception as e:
+                logger.warning(f"Erro ao pré-aquecer a conexão com {name}: {e}")
+
+        await asyncio.gather(
+            _warm("Groq", self.get_groq),
+            _warm("OpenAI", self.get_openai)
+        )
+
+    async def close(self) -> None:
+        if self._preload is not None:
+            self._preload.cancel()
+            self._preload = None
+
+        for name, client in (("Groq", self._groq), ("OpenAI", self._openai)):
+            if client is None:
+                continue
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f"Erro ao fechar o cliente {name}: {e}")
+
+        self._groq = None
+        self._openai = None
+        self._warmed_up = False
+        logger.info("Clientes de IA fechados")
+
+provider_clients = ProviderClients()
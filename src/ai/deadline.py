@@ -0,0 +1,43 @@
+import time
+from typing import Optional
+
+class DeadlineExceeded(TimeoutError):
+    """
+    O prazo do pedido acabou antes de uma etapa terminar.
+    """
+    def __init__(self, stage: str):
+        super().__init__(f"Prazo do pedido esgotado durante: {stage}")
+        self.stage = stage
+
+class Deadline:
+    """
+    Prazo absoluto de um pedido, medido em `time.monotonic()`.
+
+    É criado quando a menção ou o comando chega e passado para todas as etapas (fila,
+    tentativas, fallback e envio), que usam apenas o tempo que ainda resta em vez de um
+    timeout fixo cada uma.
+    """
+    def __init__(self, seconds: float, now: Optional[float] = None):
+        self.expires_at = (time.monotonic() if now is None else now) + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def limit(self, seconds: float) -> "Deadline":
+        """
+        Prazo de uma etapa: o menor entre o prazo do pedido e `seconds` a partir de agora.
+        """
+        deadline = Deadline(seconds)
+        deadline.expires_at = min(deadline.expires_at, self.expires_at)
+        return deadline
+
+    def timeout(self, cap: float) -> float:
+        return min(cap, self.remaining())
+
+    def check(self, stage: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(stage)
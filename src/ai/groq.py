@@ -1,47 +1,61 @@
-import os
 import asyncio
-from typing import List, Dict, Any
-
-import groq
-from groq.types.chat import ChatCompletion
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 from src.utils.logger import get_logger
 from src.utils.config import get_config
+from src.ai.clients import provider_clients
+from src.ai.retry import with_retries
+from src.ai.deadline import Deadline
 
 logger = get_logger(__name__)
 
-async def generate_response(messages: List[Dict[str, str]]) -> str:
+async def generate_response(messages: List[Dict[str, str]], deadline: Optional[Deadline] = None) -> str:
     config = get_config()
-    api_key = os.getenv("GROQ_API_KEY")
-
-    if not api_key:
-        raise ValueError("GROQ_API_KEY não encontrada nas variáveis de ambiente")
-
-    client = groq.AsyncClient(api_key=api_key)
+    client = provider_clients.get_groq()
 
     try:
-        response = await client.chat.completions.create(
+        response = await with_retries("groq", lambda timeout: client.chat.completions.create(
             model=config.ai_model,
             messages=messages,
             temperature=config.temperature,
             max_tokens=config.max_tokens,
-            timeout=config.response_timeout
-        )
+            timeout=timeout
+        ), deadline)
 
         return response.choices[0].message.content
     except Exception as e:
         logger.error(f"Erro ao gerar resposta com Groq: {e}")
         raise
-    finally:
-        await client.close()
 
-async def get_available_models() -> List[str]:
-    api_key = os.getenv("GROQ_API_KEY")
+async def stream_response(messages: List[Dict[str, str]], deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+    config = get_config()
+    client = provider_clients.get_groq()
+
+    try:
+        stream = await with_retries("groq", lambda timeout: client.chat.completions.create(
+            model=config.ai_model,
+            messages=messages,
+            temperature=config.temperature,
+            max_tokens=config.max_tokens,
+            timeout=timeout,
+            stream=True
+        ), deadline)
+    except Exception as e:
+        logger.error(f"Erro ao iniciar streaming com Groq: {e}")
+        raise
 
-    if not api_key:
-        raise ValueError("GROQ_API_KEY não encontrada nas variáveis de ambiente")
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        logger.error(f"Erro durante streaming com Groq: {e}")
+        raise
+    finally:
+        await stream.close()
 
-    client = groq.AsyncClient(api_key=api_key)
+async def get_available_models() -> List[str]:
+    client = provider_clients.get_groq()
 
     try:
         models = await client.models.list()
@@ -49,5 +63,3 @@ async def get_available_models() -> List[str]:
     except Exception as e:
         logger.error(f"Erro ao obter modelos disponíveis da Groq: {e}")
         return []
-    finally:
-        await client.close()
@@ -0,0 +1,141 @@
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Disjuntor de um provedor de IA.
+
+    Guarda o resultado e a latência das chamadas dos últimos `window_seconds`. Quando há
+    pelo menos `min_requests` chamadas e a fração de falhas (erros ou chamadas mais lentas
+    que `slow_call_seconds`) chega a `error_threshold`, o circuito abre e o provedor deixa
+    de receber tráfego. Depois de `open_seconds`, até `half_open_probes` chamadas de teste
+    são liberadas: um sucesso fecha o circuito, uma falha o abre novamente. A vaga de
+    teste é reservada por `try_acquire` no momento em que o pedido é roteado.
+    """
+    def __init__(self, name: str, window_seconds: float = 60.0, min_requests: int = 5,
+                 error_threshold: float = 0.5, slow_call_seconds: float = 15.0,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self._calls = deque()
+        self._failures = 0
+        self._probes = 0
+
+    def available(self) -> bool:
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.open_seconds
+
+        return self._probes < self.half_open_probes
+
+    def try_acquire(self) -> bool:
+        """
+        Reserva a vez de uma chamada ao provedor. Com o circuito meio-aberto, cada reserva
+        ocupa uma das `half_open_probes` chamadas de teste até `on_success`, `on_failure`
+        ou `on_cancel`; sem vaga, a chamada deve ir para outro provedor.
+        """
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuito de {self.name} meio-aberto, enviando chamada de teste")
+
+        if self._probes >= self.half_open_probes:
+            return False
+
+        self._probes += 1
+        return True
+
+    def on_success(self, latency: float) -> None:
+        failed = latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._release_probe()
+            if failed:
+                self._open()
+            else:
+                self._close()
+            return
+
+        self._record(failed, latency)
+
+    def on_failure(self, latency: float) -> None:
+        if self.state == HALF_OPEN:
+            self._release_probe()
+            self._open()
+            return
+
+        self._record(True, latency)
+
+    def on_cancel(self) -> None:
+        if self.state == HALF_OPEN:
+            self._release_probe()
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._prune(time.monotonic())
+        requests = len(self._calls)
+        latencies = sorted(latency for _, _, latency in self._calls)
+
+        return {
+            "name": self.name,
+            "state": self.state,
+            "requests": requests,
+            "error_rate": self._failures / requests if requests else 0.0,
+            "p95_latency": latencies[min(requests - 1, int(0.95 * requests))] if requests else None,
+            "open_for": time.monotonic() - self.opened_at if self.state != CLOSED else None
+        }
+
+    def _record(self, failed: bool, latency: float) -> None:
+        now = time.monotonic()
+        self._calls.append((now, failed, latency))
+        if failed:
+            self._failures += 1
+        self._prune(now)
+
+        if self.state == CLOSED and len(self._calls) >= self.min_requests:
+            if self._failures / len(self._calls) >= self.error_threshold:
+                self._open()
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            _, failed, _ = self._calls.popleft()
+            if failed:
+                self._failures -= 1
+
+    def _release_probe(self) -> None:
+        self._probes = max(0, self._probes - 1)
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            logger.warning(f"Circuito de {self.name} aberto: tráfego desviado para o outro provedor")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        logger.info(f"Circuito de {self.name} fechado: provedor saudável novamente")
+        self.state = CLOSED
+        self.opened_at = None
+        self._calls.clear()
+        self._failures = 0
@@ -0,0 +1,23 @@
+from collections import deque
+from typing import Optional
+
+class LatencyWindow:
+    """
+    Janela deslizante com as últimas `size` latências observadas de um provedor.
+    """
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self.samples)
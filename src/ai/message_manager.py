@@ -1,3 +1,5 @@
+from src.utils import metrics
 from src.ai.message_store import MessageManager
 
 message_manager = MessageManager(use_persistence=True)
+metrics.register_collector(message_manager.collect_metrics)
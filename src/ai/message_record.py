@@ -0,0 +1,57 @@
+import sys
+from typing import Any, Dict, Optional
+
+from src.ai.tokens import count_tokens, MESSAGE_OVERHEAD_TOKENS
+
+DEFAULT_USERNAME = "Usuário"
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else None
+
+class MessageRecord:
+    """
+    Uma mensagem do histórico de um canal.
+
+    Usa `__slots__` em vez de um dicionário por mensagem, e os campos que se repetem em
+    milhares de mensagens (papel, ID e nome do usuário) são internados, de modo que cada
+    valor distinto existe uma vez só na memória. O texto já vem formatado para o prompt
+    ("nome: conteúdo" nas mensagens de usuário) junto com a sua contagem de tokens; o
+    conteúdo original é derivado dele, sem guardar uma segunda cópia.
+    """
+    __slots__ = ("role", "prompt", "user_id", "username", "timestamp", "tokens")
+
+    def __init__(self, role: str, content: str, timestamp: float,
+                 user_id: Optional[str] = None, username: Optional[str] = None):
+        self.role = sys.intern(role)
+        self.user_id = _intern(user_id)
+        self.username = _intern(username)
+        self.timestamp = timestamp
+
+        if self.role == "user":
+            self.prompt = f"{self.username or DEFAULT_USERNAME}: {content}"
+        else:
+            self.prompt = content
+        self.tokens = count_tokens(self.prompt) + MESSAGE_OVERHEAD_TOKENS
+
+    @property
+    def content(self) -> str:
+        if self.role == "user":
+            return self.prompt[len(self.username or DEFAULT_USERNAME) + 2:]
+        return self.prompt
+
+    def to_prompt(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.prompt}
+
+    def to_dict(self) -> Dict[str, Any]:
+        message = {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp
+        }
+
+        if self.user_id:
+            message["user_id"] = self.user_id
+        if self.username:
+            message["username"] = self.username
+
+        return message
@@ -1,261 +1,457 @@
-import os
 import time
-import sqlite3
-from typing import List, Dict, Any, Optional
-from collections import deque
-from pathlib import Path
+import asyncio
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Set, Tuple
+from collections import deque, OrderedDict
 
 from src.utils.logger import get_logger
-from src.utils.config import get_config
+from src.utils.config import get_config, BotConfig
+from src.utils import metrics
 from src.ai.personality import create_system_message
+from src.ai.persistence import MessagePersistence
+from src.ai.message_record import MessageRecord
+from src.ai.summarizer import summarize_history
+from src.ai.tokens import count_message_tokens, context_token_budget
 
 logger = get_logger(__name__)
 
+Summarizer = Callable[[Optional[str], List[MessageRecord]], Awaitable[str]]
+
+RESIDENT_STORES = metrics.gauge(
+    "ai_resident_stores",
+    "Armazenamentos de mensagens de canais mantidos em memória"
+)
+EVICTED_STORES = metrics.counter(
+    "ai_evicted_stores_total",
+    "Armazenamentos de mensagens removidos da memória, por motivo",
+    labelnames=("reason",)
+)
+CHANNEL_HISTORY = metrics.histogram(
+    "ai_channel_history_messages",
+    "Mensagens no histórico de cada canal em memória, calculado a cada leitura das métricas",
+    buckets=(1, 5, 10, 20, 30, 40, 50, 100, 200)
+)
+
+_system_tokens_cache = (None, 0)
+
+def _system_message_tokens(system_message: Dict[str, str]) -> int:
+    global _system_tokens_cache
+
+    cached_message, tokens = _system_tokens_cache
+    if cached_message is not system_message:
+        tokens = count_message_tokens(system_message)
+        _system_tokens_cache = (system_message, tokens)
+    return tokens
+
 class MessageStore:
     def __init__(self, channel_id: Optional[str] = None, max_messages: int = 50,
-                 use_persistence: bool = False, db_path: str = "data/messages.db"):
+                 persistence: Optional[MessagePersistence] = None,
+                 summarizer: Optional[Summarizer] = None, guild_id: Optional[str] = None):
         self.channel_id = channel_id
+        self.guild_id = guild_id
         self.max_messages = max_messages
         self.messages = deque(maxlen=max_messages)
-        self.use_persistence = use_persistence
-        self.db_path = db_path
-
-        if use_persistence:
-            self._setup_db()
-            self._load_from_db()
-
-    def add_user_message(self, user_id: str, username: str, content: str) -> None:
-        message = {
-            "role": "user",
-            "content": content,
-            "user_id": user_id,
-            "username": username,
-            "timestamp": time.time()
-        }
-        self._add_message(message)
-
-    def add_assistant_message(self, content: str) -> None:
-        message = {
-            "role": "assistant",
-            "content": content,
-            "timestamp": time.time()
-        }
-        self._add_message(message)
-
-    def add_system_message(self, content: str) -> None:
-        message = {
-            "role": "system",
-            "content": content,
-            "timestamp": time.time()
-        }
-        self._add_message(message)
-
-    def get_messages(self) -> List[Dict[str, str]]:
-        formatted_messages = []
-
-        formatted_messages.append(create_system_message())
-
-        for msg in self.messages:
-            if msg["role"] == "user":
-                content = f"{msg.get('username', 'Usuário')}: {msg['content']}"
-                formatted_messages.append({"role": "user", "content": content})
-            else:
-                formatted_messages.append({"role": msg["role"], "content": msg["content"]})
+        self.persistence = persistence
+        self.use_persistence = persistence is not None
 
-        return formatted_messages
+        # Resumo das mensagens antigas já compactadas, enviado logo após o prompt de sistema.
+        self.summarizer = summarizer
+        self.summary: Optional[str] = None
+        self._summary_message: Optional[Dict[str, str]] = None
+        self._summary_tokens = 0
+        self._compaction: Optional[asyncio.Task] = None
+        self._generation = 0
 
-    def get_raw_messages(self) -> List[Dict[str, Any]]:
-        return list(self.messages)
+        # Soma dos tokens das mensagens em self.messages, que já guardam o texto do prompt.
+        self._prompt_tokens = 0
 
-    def clear(self) -> None:
-        self.messages.clear()
+    async def load(self, since: float = 0.0) -> None:
+        """
+        Carrega o histórico persistido, ignorando o que for anterior a `since`.
+        """
         if self.use_persistence and self.channel_id:
-            self._clear_from_db()
+            messages = await self.persistence.load(self.channel_id, self.max_messages)
+            summary = await self.persistence.load_summary(self.channel_id)
 
-    def _add_message(self, message: Dict[str, Any]) -> None:
-        self.messages.append(message)
+            if since:
+                messages = [message for message in messages if message.timestamp >= since]
+                if summary is not None and summary[1] < since:
+                    summary = None
+
+            self.restore(messages, summary)
+
+    def restore(self, messages: List[MessageRecord], summary: Optional[Tuple[str, float]] = None) -> None:
+        """
+        Substitui o histórico em memória por mensagens já persistidas, sem regravá-las.
+        Com um resumo `(texto, até)`, as mensagens que ele já cobre são descartadas.
+        """
+        self._reset()
+
+        if summary is not None:
+            text, until = summary
+            self._set_summary(text)
+            messages = [message for message in messages if message.timestamp > until]
+
+        for message in messages:
+            self._append(message)
+
+    async def add_user_message(self, user_id: str, username: str, content: str) -> None:
+        await self._add_message(MessageRecord("user", content, time.time(), user_id, username))
+
+    async def add_assistant_message(self, content: str) -> None:
+        await self._add_message(MessageRecord("assistant", content, time.time()))
+        self._maybe_compact()
+
+    async def add_system_message(self, content: str) -> None:
+        await self._add_message(MessageRecord("system", content, time.time()))
+
+    def get_messages(self, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Monta o prompt com a mensagem de sistema e as mensagens mais recentes que cabem
+        no orçamento de tokens, descontados o prompt de sistema e `max_tokens` da resposta.
+        A mensagem mais recente sempre entra.
+        """
+        system_message = create_system_message()
+        prefix = [system_message]
+        if self._summary_message is not None:
+            prefix.append(self._summary_message)
+
+        if token_budget is None:
+            token_budget = context_token_budget()
+        available = (token_budget - _system_message_tokens(system_message) - self._summary_tokens
+                     - get_config().max_tokens)
+
+        if self._prompt_tokens <= available:
+            return prefix + [message.to_prompt() for message in self.messages]
+
+        selected = []
+        for message in reversed(self.messages):
+            if message.tokens > available and selected:
+                break
+
+            available -= message.tokens
+            selected.append(message.to_prompt())
+
+        selected.reverse()
+        return prefix + selected
+
+    def get_raw_messages(self) -> List[Dict[str, Any]]:
+        return [message.to_dict() for message in self.messages]
+
+    async def clear(self) -> None:
+        self._reset()
         if self.use_persistence and self.channel_id:
-            self._save_to_db()
-
-    def _setup_db(self) -> None:
-        db_dir = os.path.dirname(self.db_path)
-        if db_dir and not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channel_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_id TEXT NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            user_id TEXT,
-            username TEXT,
-            timestamp REAL NOT NULL,
-            UNIQUE(channel_id, timestamp)
-        )
-        ''')
+            await self.persistence.clear(self.channel_id)
 
-        cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_channel_timestamp
-        ON channel_messages(channel_id, timestamp)
-        ''')
+    def _reset(self) -> None:
+        self.messages.clear()
+        self._prompt_tokens = 0
+        self._set_summary(None)
+        self._generation += 1
+
+    def _set_summary(self, summary: Optional[str]) -> None:
+        self.summary = summary
+        if summary is None:
+            self._summary_message = None
+            self._summary_tokens = 0
+            return
 
-        conn.commit()
-        conn.close()
+        self._summary_message = {"role": "system", "content": f"Resumo da conversa até aqui: {summary}"}
+        self._summary_tokens = count_message_tokens(self._summary_message)
 
-    def _save_to_db(self) -> None:
-        if not self.channel_id:
+    def _maybe_compact(self) -> None:
+        """
+        Quando o histórico passa de `summary_trigger_tokens`, resume em segundo plano as
+        mensagens mais antigas, mantendo as últimas `summary_keep_messages` intactas.
+        """
+        if self.summarizer is None or self._compaction is not None:
             return
 
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-            DELETE FROM channel_messages
-            WHERE channel_id = ?
-            AND timestamp NOT IN (
-                SELECT timestamp FROM channel_messages
-                WHERE channel_id = ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            )
-            ''', (self.channel_id, self.channel_id, self.max_messages))
-
-            latest_msg = self.messages[-1]
-
-            values = [
-                self.channel_id,
-                latest_msg["role"],
-                latest_msg["content"],
-                latest_msg.get("user_id"),
-                latest_msg.get("username"),
-                latest_msg["timestamp"]
-            ]
-
-            cursor.execute('''
-            INSERT OR REPLACE INTO channel_messages
-            (channel_id, role, content, user_id, username, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', values)
-
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"Erro ao salvar mensagem no banco de dados: {e}")
+        config = get_config()
+        if self._prompt_tokens + self._summary_tokens < config.summary_trigger_tokens:
+            return
 
-    def _load_from_db(self) -> None:
-        if not self.channel_id:
+        keep = config.summary_keep_messages
+        if len(self.messages) - keep < 2:
             return
 
+        span = list(self.messages)[:len(self.messages) - keep]
+        self._compaction = asyncio.create_task(self._compact(span, self._generation))
+
+    async def _compact(self, span: List[MessageRecord], generation: int) -> None:
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-            SELECT role, content, user_id, username, timestamp
-            FROM channel_messages
-            WHERE channel_id = ?
-            ORDER BY timestamp ASC
-            LIMIT ?
-            ''', (self.channel_id, self.max_messages))
-
-            rows = cursor.fetchall()
-
-            self.messages.clear()
-            for role, content, user_id, username, timestamp in rows:
-                msg = {
-                    "role": role,
-                    "content": content,
-                    "timestamp": timestamp
-                }
-
-                if user_id:
-                    msg["user_id"] = user_id
-                if username:
-                    msg["username"] = username
-
-                self.messages.append(msg)
-
-            conn.close()
+            summary = await self.summarizer(self.summary, span)
         except Exception as e:
-            logger.error(f"Erro ao carregar mensagens do banco de dados: {e}")
+            logger.warning(f"Erro ao resumir o histórico do canal {self.channel_id}: {e}")
+            return
+        finally:
+            self._compaction = None
 
-    def _clear_from_db(self) -> None:
-        if not self.channel_id:
+        if not summary or generation != self._generation:
             return
 
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        # Mensagens do trecho que já saíram da deque pelo maxlen também ficam cobertas.
+        summarized = {id(message) for message in span}
+        while self.messages and id(self.messages[0]) in summarized:
+            self._prompt_tokens -= self.messages.popleft().tokens
+
+        self._set_summary(summary)
+        if self.use_persistence and self.channel_id:
+            self.persistence.put_summary(self.channel_id, summary, span[-1].timestamp)
 
-            cursor.execute('''
-            DELETE FROM channel_messages WHERE channel_id = ?
-            ''', (self.channel_id,))
+        logger.debug(f"Histórico do canal {self.channel_id}: {len(span)} mensagens compactadas em resumo")
 
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"Erro ao limpar mensagens do banco de dados: {e}")
+    def _append(self, message: MessageRecord) -> None:
+        if len(self.messages) == self.messages.maxlen:
+            self._prompt_tokens -= self.messages[0].tokens
+
+        self.messages.append(message)
+        self._prompt_tokens += message.tokens
+
+    async def _add_message(self, message: MessageRecord) -> None:
+        self._append(message)
+        if self.use_persistence and self.channel_id:
+            self.persistence.append(self.channel_id, message, self.guild_id)
 
 
 class MessageManager:
     """
     Gerenciador global de armazenamentos de mensagens para múltiplos canais.
+
+    Os armazenamentos ficam em um OrderedDict na ordem do último acesso, então o menos
+    usado está sempre no começo. A cada acesso, os que passaram de `store_idle_seconds`
+    sem uso ou excedem `store_max_resident` saem da memória em O(1) cada; com
+    persistência, o histórico continua no banco e é recarregado no próximo acesso.
+    Um índice servidor → canais permite apagar um servidor inteiro de uma vez. O banco
+    só é aberto no primeiro uso, e não ao importar o módulo.
     """
     def __init__(self, use_persistence: bool = False, db_path: str = "data/messages.db"):
-        self.stores = {}
+        self.stores: "OrderedDict[str, MessageStore]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._guild_channels: Dict[str, Set[str]] = {}
+        self.started_at = time.time()
+        self._loading: Dict[str, asyncio.Future] = {}
         self.use_persistence = use_persistence
         self.db_path = db_path
-        self.config = get_config()
+        self._persistence: Optional[MessagePersistence] = None
 
-    def get_store(self, channel_id: str) -> MessageStore:
-        if channel_id not in self.stores:
-            self.stores[channel_id] = MessageStore(
-                channel_id=channel_id,
+    @property
+    def config(self) -> BotConfig:
+        return get_config()
+
+    @property
+    def persistence(self) -> Optional[MessagePersistence]:
+        if self._persistence is None and self.use_persistence:
+            self._persistence = MessagePersistence(
+                db_path=self.db_path,
                 max_messages=self.config.max_context_messages,
-                use_persistence=self.use_persistence,
-                db_path=self.db_path
+                batch_size=self.config.db_batch_size,
+                flush_interval=self.config.db_flush_interval,
+                synchronous=self.config.db_synchronous
             )
-        return self.stores[channel_id]
+        return self._persistence
 
-    def clear_store(self, channel_id: str) -> bool:
-        if channel_id in self.stores:
-            self.stores[channel_id].clear()
-            return True
-        return False
+    async def get_store(self, channel_id: str, guild_id: Optional[str] = None) -> MessageStore:
+        store = self.stores.get(channel_id)
+        if store is not None:
+            if guild_id and store.guild_id is None:
+                store.guild_id = guild_id
+                self._guild_channels.setdefault(guild_id, set()).add(channel_id)
+            self._touch(channel_id)
+            return store
 
-    def cleanup_old_stores(self, max_age_seconds: int = 86400) -> int:
+        loading = self._loading.get(channel_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[channel_id] = loading
+
+        try:
+            store = self._new_store(channel_id, guild_id)
+            # No modo "never" só volta o que foi dito desde que o bot iniciou, para que um
+            # canal removido da memória por inatividade não perca a conversa atual.
+            await store.load(self.started_at if self.config.history_hydration == "never" else 0.0)
+            self._add_store(channel_id, store)
+            loading.set_result(store)
+            return store
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            loading.exception()
+            raise
+        finally:
+            del self._loading[channel_id]
+
+    async def hydrate(self) -> int:
         """
-        Remove armazenamentos de mensagens inativos.
+        Pré-carrega os históricos dos canais ativos conforme `history_hydration`.
+
+        No modo "eager", as últimas mensagens dos canais com atividade recente são lidas
+        em uma única consulta, no máximo `store_max_resident` canais, dos mais recentes
+        para os mais antigos. Nos modos "lazy" e "never" nada é feito aqui.
+
+        Returns:
+            Número de armazenamentos carregados
+        """
+        mode = self.config.history_hydration
+        if not self.use_persistence or mode != "eager":
+            logger.info(f"Hidratação do histórico no início: modo {mode}, nada a carregar")
+            return 0
+
+        start = time.perf_counter()
+        since = time.time() - self.config.hydration_max_age
+        histories = await self.persistence.load_recent(
+            self.config.max_context_messages, since, self.config.store_max_resident
+        )
+        summaries = await self.persistence.load_summaries()
+
+        # Do mais antigo para o mais recente, para que o canal mais ativo fique no fim da
+        # ordem de uso e seja o último a sair da memória.
+        total_messages = 0
+        for channel_id, (guild_id, messages) in reversed(list(histories.items())):
+            if channel_id in self.stores:
+                continue
+
+            store = self._new_store(channel_id, guild_id)
+            store.restore(messages, summaries.get(channel_id))
+            self._add_store(channel_id, store)
+            total_messages += len(messages)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Hidratação do histórico concluída: {len(histories)} canais, {total_messages} mensagens em {elapsed_ms:.1f} ms")
+        return len(histories)
+
+    def _new_store(self, channel_id: str, guild_id: Optional[str] = None) -> MessageStore:
+        return MessageStore(
+            channel_id=channel_id,
+            max_messages=self.config.max_context_messages,
+            persistence=self.persistence,
+            summarizer=summarize_history if self.config.summary_enabled else None,
+            guild_id=guild_id
+        )
+
+    def _touch(self, channel_id: str) -> None:
+        self.stores.move_to_end(channel_id)
+        self._last_used[channel_id] = time.monotonic()
+        self.evict()
+
+    def _add_store(self, channel_id: str, store: MessageStore) -> None:
+        self.stores[channel_id] = store
+        if store.guild_id:
+            self._guild_channels.setdefault(store.guild_id, set()).add(channel_id)
+        self._touch(channel_id)
+        RESIDENT_STORES.set(len(self.stores))
+
+    def _remove_store(self, channel_id: str, reason: str) -> None:
+        store = self.stores.pop(channel_id)
+        del self._last_used[channel_id]
+
+        channels = self._guild_channels.get(store.guild_id)
+        if channels is not None:
+            channels.discard(channel_id)
+            if not channels:
+                del self._guild_channels[store.guild_id]
+
+        EVICTED_STORES.inc(reason=reason)
+        RESIDENT_STORES.set(len(self.stores))
+
+    async def clear_all(self) -> Tuple[int, int]:
+        """
+        Apaga o histórico e o resumo de todos os canais, em memória e no banco, para que
+        um canal fora da memória não volte com a conversa de antes (ao trocar a
+        personalidade, por exemplo).
+
+        Returns:
+            Armazenamentos limpos em memória e mensagens apagadas do banco
+        """
+        for store in self.stores.values():
+            store._reset()
+
+        deleted = 0
+        if self.use_persistence:
+            deleted = await self.persistence.clear_all()
+
+        return len(self.stores), deleted
+
+    async def purge_guild(self, guild_id: str, channel_ids: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Apaga todo o histórico de um servidor: os armazenamentos em memória, pelo índice
+        servidor → canais, e as linhas do banco, em uma única transação.
 
         Args:
-            max_age_seconds: Idade máxima em segundos (padrão: 24 horas)
+            guild_id: ID do servidor
+            channel_ids: Canais conhecidos do servidor, para cobrir históricos antigos
+                gravados sem o ID do servidor
+
+        Returns:
+            Armazenamentos removidos da memória e mensagens apagadas do banco
+        """
+        channels = set(self._guild_channels.pop(guild_id, ())) | set(channel_ids or ())
+
+        removed = 0
+        for channel_id in channels:
+            if channel_id in self.stores:
+                self._remove_store(channel_id, "guild")
+                removed += 1
+
+        deleted = 0
+        if self.use_persistence:
+            deleted = await self.persistence.purge_guild(guild_id, channel_ids)
+
+        return removed, deleted
+
+    def evict(self, max_idle_seconds: Optional[float] = None) -> int:
+        """
+        Remove da memória, a partir do menos usado, os armazenamentos parados há mais de
+        `max_idle_seconds` (padrão: `store_idle_seconds`) e os que excedem `store_max_resident`.
 
         Returns:
             Número de armazenamentos removidos
         """
-        current_time = time.time()
-        to_remove = []
+        if max_idle_seconds is None:
+            max_idle_seconds = self.config.store_idle_seconds
+        max_resident = self.config.store_max_resident
+        cutoff = time.monotonic() - max_idle_seconds
+        removed = 0
+
+        while self.stores:
+            channel_id = next(iter(self.stores))
+            if max_resident and len(self.stores) > max_resident:
+                reason = "capacity"
+            elif self._last_used[channel_id] < cutoff:
+                reason = "idle"
+            else:
+                break
 
-        for channel_id, store in self.stores.items():
-            if not store.messages:
-                to_remove.append(channel_id)
-                continue
+            self._remove_store(channel_id, reason)
+            removed += 1
+
+        return removed
+
+    async def clear_store(self, channel_id: str) -> bool:
+        if channel_id in self.stores:
+            await self.stores[channel_id].clear()
+            return True
 
-            latest_msg = max(msg["timestamp"] for msg in store.messages)
-            if current_time - latest_msg > max_age_seconds:
-                to_remove.append(channel_id)
+        if self.use_persistence:
+            return await self.persistence.clear(channel_id) > 0
+        return False
 
-        for channel_id in to_remove:
-            del self.stores[channel_id]
+    def cleanup_old_stores(self, max_age_seconds: Optional[float] = None) -> int:
+        """
+        Remove armazenamentos de mensagens inativos.
 
-        return len(to_remove)
+        Args:
+            max_age_seconds: Tempo máximo sem uso em segundos (padrão: `store_idle_seconds`)
+
+        Returns:
+            Número de armazenamentos removidos
+        """
+        return self.evict(max_age_seconds)
 
-    def cleanup_db(self, max_age_seconds: int = 604800) -> int:
+    async def cleanup_db(self, max_age_seconds: int = 604800) -> int:
         """
         Remove mensagens antigas do banco de dados.
 
@@ -268,20 +464,17 @@ class MessageManager:
         if not self.use_persistence:
             return 0
 
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cutoff_time = time.time() - max_age_seconds
-            cursor.execute('''
-            DELETE FROM channel_messages WHERE timestamp < ?
-            ''', (cutoff_time,))
+        return await self.persistence.cleanup(max_age_seconds)
 
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+    def collect_metrics(self) -> None:
+        CHANNEL_HISTORY.clear()
+        for store in self.stores.values():
+            CHANNEL_HISTORY.observe(len(store.messages))
+        RESIDENT_STORES.set(len(self.stores))
 
-            return deleted_count
-        except Exception as e:
-            logger.error(f"Erro ao limpar mensagens antigas do banco de dados: {e}")
-            return 0
+    def close(self) -> None:
+        """
+        Grava as mensagens pendentes e fecha o banco de dados.
+        """
+        if self._persistence is not None:
+            self._persistence.close()
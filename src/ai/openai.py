@@ -1,45 +1,61 @@
-import os
 import asyncio
-from typing import List, Dict, Any
-
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletion
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 from src.utils.logger import get_logger
 from src.utils.config import get_config
+from src.ai.clients import provider_clients
+from src.ai.retry import with_retries
+from src.ai.deadline import Deadline
 
 logger = get_logger(__name__)
 
-async def generate_response(messages: List[Dict[str, str]]) -> str:
+async def generate_response(messages: List[Dict[str, str]], deadline: Optional[Deadline] = None) -> str:
     config = get_config()
-    api_key = os.getenv("OPENAI_API_KEY")
-
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY não encontrada nas variáveis de ambiente")
-
-    client = AsyncOpenAI(api_key=api_key)
+    client = provider_clients.get_openai()
 
     try:
-        response = await client.chat.completions.create(
+        response = await with_retries("openai", lambda timeout: client.chat.completions.create(
             model=config.openai_model,
             messages=messages,
             temperature=config.temperature,
             max_tokens=config.max_tokens,
-            timeout=config.response_timeout
-        )
+            timeout=timeout
+        ), deadline)
 
         return response.choices[0].message.content
     except Exception as e:
         logger.error(f"Erro ao gerar resposta com OpenAI: {e}")
         raise
 
-async def get_available_models() -> List[str]:
-    api_key = os.getenv("OPENAI_API_KEY")
+async def stream_response(messages: List[Dict[str, str]], deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+    config = get_config()
+    client = provider_clients.get_openai()
 
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY não encontrada nas variáveis de ambiente")
+    try:
+        stream = await with_retries("openai", lambda timeout: client.chat.completions.create(
+            model=config.openai_model,
+            messages=messages,
+            temperature=config.temperature,
+            max_tokens=config.max_tokens,
+            timeout=timeout,
+            stream=True
+        ), deadline)
+    except Exception as e:
+        logger.error(f"Erro ao iniciar streaming com OpenAI: {e}")
+        raise
+
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        logger.error(f"Erro durante streaming com OpenAI: {e}")
+        raise
+    finally:
+        await stream.close()
 
-    client = AsyncOpenAI(api_key=api_key)
+async def get_available_models() -> List[str]:
+    client = provider_clients.get_openai()
 
     try:
         models = await client.models.list()
@@ -0,0 +1,606 @@
+import os
+import time
+import queue
+import atexit
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from src.utils.logger import get_logger
+from src.utils import metrics
+from src.ai.message_record import MessageRecord
+
+logger = get_logger(__name__)
+
+DB_OPERATION = metrics.histogram(
+    "ai_db_operation_seconds",
+    "Duração das operações no SQLite, na thread de escrita",
+    labelnames=("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+_STOP = object()
+
+SCHEMA_VERSION = 3
+
+# Intervalo entre tentativas de reabrir um banco que não pôde ser aberto.
+REOPEN_INTERVAL = 30.0
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL")
+
+def _row_to_message(row: Tuple[Any, ...]) -> MessageRecord:
+    role, content, user_id, username, timestamp = row
+    return MessageRecord(role, content, timestamp, user_id, username)
+
+class MessagePersistence:
+    """
+    Motor de persistência SQLite compartilhado por todos os armazenamentos de mensagens.
+
+    Toda a E/S acontece em uma thread dedicada, dona de uma única conexão (modo WAL).
+    As novas mensagens são enfileiradas sem bloquear o event loop e gravadas em uma
+    única transação quando o buffer atinge `batch_size` mensagens ou quando a mensagem
+    pendente mais antiga ultrapassa `flush_interval` segundos. Leituras e limpezas são
+    expostas como corrotinas que aguardam o resultado da thread de escrita.
+
+    Cada canal ocupa no máximo `max_messages` linhas, endereçadas por `slot = seq % max_messages`,
+    onde `seq` é um contador monotônico por canal. Uma nova mensagem sobrescreve o slot da
+    mais antiga, então manter o histórico limitado custa O(1) por inserção. O resumo das
+    mensagens antigas de cada canal fica na tabela `channel_summaries`.
+    """
+    def __init__(self, db_path: str = "data/messages.db", max_messages: int = 50,
+                 batch_size: int = 32, flush_interval: float = 2.0, synchronous: str = "NORMAL"):
+        self.db_path = db_path
+        self.max_messages = max(1, max_messages)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous.upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous precisa ser um de {', '.join(SYNCHRONOUS_MODES)}: {synchronous!r}")
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._pending: List[Tuple[Any, ...]] = []
+        self._pending_since: Optional[float] = None
+        self._seqs: Dict[str, int] = {}
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._reopen_at = 0.0
+
+        self._submit(self._open)
+        self._writer = threading.Thread(target=self._run, name="message-db-writer", daemon=True)
+        self._writer.start()
+
+        atexit.register(self.close)
+
+    def append(self, channel_id: str, message: MessageRecord, guild_id: Optional[str] = None) -> None:
+        """
+        Enfileira uma mensagem para gravação sem bloquear. A escrita acontece no próximo lote.
+        """
+        if self._closed:
+            return
+
+        row = (
+            channel_id,
+            guild_id,
+            message.role,
+            message.content,
+            message.user_id,
+            message.username,
+            message.timestamp
+        )
+        self._queue.put(("append", row))
+
+    async def load(self, channel_id: str, limit: int) -> List[MessageRecord]:
+        return await self._call(self._load, channel_id, limit)
+
+    async def load_recent(self, limit: int, since: float = 0.0,
+                          max_channels: int = 0) -> Dict[str, Tuple[Optional[str], List[MessageRecord]]]:
+        """
+        Carrega, em uma única consulta, as últimas `limit` mensagens dos canais cuja
+        mensagem mais recente é posterior a `since`, do canal mais recente para o mais
+        antigo, limitados aos `max_channels` mais recentes (0 = sem limite).
+
+        Returns:
+            Para cada canal, o ID do servidor (None em linhas antigas) e as mensagens
+        """
+        return await self._call(self._load_recent, limit, since, max_channels)
+
+    async def clear(self, channel_id: str) -> int:
+        return await self._call(self._clear, channel_id)
+
+    async def clear_all(self) -> int:
+        """
+        Apaga as mensagens e os resumos de todos os canais.
+        """
+        return await self._call(self._clear_all)
+
+    async def purge_guild(self, guild_id: str, channel_ids: Optional[List[str]] = None) -> int:
+        """
+        Apaga em uma única transação as mensagens e os resumos de todos os canais de um
+        servidor. `channel_ids` cobre linhas gravadas antes de existir a coluna `guild_id`.
+        """
+        return await self._call(self._purge_guild, guild_id, list(channel_ids or ()))
+
+    async def cleanup(self, max_age_seconds: int) -> int:
+        return await self._call(self._cleanup, max_age_seconds)
+
+    async def flush(self) -> None:
+        await self._call(self._flush)
+
+    def put_cached_response(self, key: str, response: str, created_at: float) -> None:
+        """
+        Grava uma resposta do cache de respostas sem bloquear.
+        """
+        if self._closed:
+            return
+        self._submit(self._put_cached_response, key, response, created_at)
+
+    def put_summary(self, channel_id: str, summary: str, until: float) -> None:
+        """
+        Grava sem bloquear o resumo de um canal, que cobre as mensagens até o timestamp `until`.
+        """
+        if self._closed:
+            return
+        self._submit(self._put_summary, channel_id, summary, until)
+
+    async def load_summary(self, channel_id: str) -> Optional[Tuple[str, float]]:
+        return await self._call(self._load_summary, channel_id)
+
+    async def load_summaries(self, since: float = 0.0) -> Dict[str, Tuple[str, float]]:
+        return await self._call(self._load_summaries, since)
+
+    async def load_cached_responses(self, limit: int, since: float) -> List[Tuple[str, str, float]]:
+        return await self._call(self._load_cached_responses, limit, since)
+
+    async def purge_cached_responses(self, before: float) -> int:
+        return await self._call(self._purge_cached_responses, before)
+
+    def close(self) -> None:
+        """
+        Grava tudo o que estiver pendente, fecha a conexão e encerra a thread de escrita.
+        Pode ser chamado mais de uma vez.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        self._queue.put(_STOP)
+        self._writer.join()
+        logger.info("Banco de dados de mensagens fechado")
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        future: Future = Future()
+        self._queue.put(("call", fn, args, future))
+        return future
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._closed:
+            raise RuntimeError("Banco de dados de mensagens já foi fechado")
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def _run(self) -> None:
+        while True:
+            timeout = None
+            if self._pending_since is not None:
+                timeout = max(0.0, self._pending_since + self.flush_interval - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush()
+                continue
+
+            if item is _STOP:
+                self._flush()
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception as e:
+                        logger.error(f"Erro ao fechar o banco de dados: {e}")
+                    self._conn = None
+                return
+
+            if item[0] == "call":
+                _, fn, args, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                start = time.perf_counter()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                DB_OPERATION.observe(time.perf_counter() - start, operation=fn.__name__.lstrip("_"))
+                continue
+
+            self._pending.append(item[1])
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _open(self) -> None:
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._create_schema()
+        except Exception as e:
+            logger.error(f"Erro ao abrir o banco de dados {self.db_path}: {e}")
+            self._conn = None
+            self._reopen_at = time.monotonic() + REOPEN_INTERVAL
+
+    def _create_schema(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        legacy = version < SCHEMA_VERSION and self._table_has_column("channel_messages", "id")
+        add_guild = (version < SCHEMA_VERSION and not legacy
+                     and self._table_has_column("channel_messages", "slot")
+                     and not self._table_has_column("channel_messages", "guild_id"))
+
+        with self._conn:
+            self._conn.execute("BEGIN")
+
+            if legacy:
+                self._conn.execute("ALTER TABLE channel_messages RENAME TO channel_messages_legacy")
+                self._conn.execute("DROP INDEX IF EXISTS idx_channel_timestamp")
+
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS channel_messages (
+                channel_id TEXT NOT NULL,
+                guild_id TEXT,
+                slot INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                user_id TEXT,
+                username TEXT,
+                timestamp REAL NOT NULL,
+                PRIMARY KEY (channel_id, slot)
+            ) WITHOUT ROWID
+            ''')
+
+            if add_guild:
+                self._conn.execute("ALTER TABLE channel_messages ADD COLUMN guild_id TEXT")
+
+            self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_channel_messages_timestamp
+            ON channel_messages(timestamp)
+            ''')
+
+            self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_channel_messages_guild
+            ON channel_messages(guild_id)
+            ''')
+
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS channel_summaries (
+                channel_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_until REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            ''')
+
+            if legacy:
+                self._migrate_legacy()
+
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _table_has_column(self, table: str, column: str) -> bool:
+        rows = self._conn.execute(f"PRAGMA table_info({table})").fetchall()
+        return any(row[1] == column for row in rows)
+
+    def _migrate_legacy(self) -> None:
+        """
+        Copia as últimas `max_messages` mensagens de cada canal do esquema antigo
+        (uma linha por mensagem, chave única em timestamp) para o anel de slots.
+        """
+        cursor = self._conn.execute('''
+        INSERT INTO channel_messages
+        (channel_id, slot, seq, role, content, user_id, username, timestamp)
+        SELECT channel_id, seq % :size, seq, role, content, user_id, username, timestamp
+        FROM (
+            SELECT *,
+                   ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY timestamp, id) - 1 AS seq,
+                   COUNT(*) OVER (PARTITION BY channel_id) AS total
+            FROM channel_messages_legacy
+        )
+        WHERE seq >= total - :size
+        ''', {"size": self.max_messages})
+
+        self._conn.execute("DROP TABLE channel_messages_legacy")
+        logger.info(f"Migradas {cursor.rowcount} mensagens para o novo formato do banco de dados")
+
+    def _next_seq(self, channel_id: str) -> int:
+        seq = self._seqs.get(channel_id)
+        if seq is None:
+            row = self._conn.execute('''
+            SELECT MAX(seq) FROM channel_messages WHERE channel_id = ?
+            ''', (channel_id,)).fetchone()
+            seq = -1 if row[0] is None else row[0]
+
+        seq += 1
+        self._seqs[channel_id] = seq
+        return seq
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        if self._conn is None and time.monotonic() >= self._reopen_at:
+            self._open()
+
+        pending = self._pending
+        self._pending = []
+        self._pending_since = None
+
+        # Sem conexão, o lote é descartado em vez de acumular e fazer `_run` girar sem
+        # espera; a próxima tentativa de abrir o banco só acontece após REOPEN_INTERVAL.
+        if self._conn is None:
+            logger.warning(f"Banco de dados indisponível, {len(pending)} mensagens descartadas")
+            return
+        start = time.perf_counter()
+
+        try:
+            rows = []
+            for row in pending:
+                seq = self._next_seq(row[0])
+                rows.append((row[0], row[1], seq % self.max_messages, seq) + row[2:])
+
+            with self._conn:
+                self._conn.executemany('''
+                INSERT OR REPLACE INTO channel_messages
+                (channel_id, guild_id, slot, seq, role, content, user_id, username, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+
+            logger.debug(f"Gravadas {len(pending)} mensagens em lote no banco de dados")
+        except Exception as e:
+            self._seqs.clear()
+            logger.error(f"Erro ao gravar lote de {len(pending)} mensagens no banco de dados: {e}")
+        DB_OPERATION.observe(time.perf_counter() - start, operation="flush")
+
+    def _load(self, channel_id: str, limit: int) -> List[MessageRecord]:
+        self._flush()
+
+        try:
+            rows = self._conn.execute('''
+            SELECT role, content, user_id, username, timestamp
+            FROM channel_messages
+            WHERE channel_id = ?
+            ORDER BY seq DESC
+            LIMIT ?
+            ''', (channel_id, limit)).fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao carregar mensagens do banco de dados: {e}")
+            return []
+
+        return [_row_to_message(row) for row in reversed(rows)]
+
+    def _load_recent(self, limit: int, since: float,
+                     max_channels: int = 0) -> Dict[str, Tuple[Optional[str], List[MessageRecord]]]:
+        self._flush()
+
+        histories: Dict[str, Tuple[Optional[str], List[MessageRecord]]] = {}
+
+        try:
+            cursor = self._conn.execute('''
+            WITH active AS (
+                SELECT channel_id, MAX(timestamp) AS last_timestamp, MAX(guild_id) AS channel_guild_id
+                FROM channel_messages
+                GROUP BY channel_id
+                HAVING last_timestamp >= ?
+                ORDER BY last_timestamp DESC
+                LIMIT ?
+            )
+            SELECT channel_id, channel_guild_id, role, content, user_id, username, timestamp
+            FROM (
+                SELECT channel_messages.*, active.last_timestamp, active.channel_guild_id,
+                       ROW_NUMBER() OVER (PARTITION BY channel_messages.channel_id ORDER BY seq DESC) AS rn
+                FROM channel_messages JOIN active USING (channel_id)
+            )
+            WHERE rn <= ?
+            ORDER BY last_timestamp DESC, channel_id, seq
+            ''', (since, max_channels if max_channels > 0 else -1, limit))
+
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    history = histories.get(row[0])
+                    if history is None:
+                        history = histories[row[0]] = (row[1], [])
+                    history[1].append(_row_to_message(row[2:]))
+        except Exception as e:
+            logger.error(f"Erro ao carregar históricos recentes do banco de dados: {e}")
+
+        return histories
+
+    def _clear(self, channel_id: str) -> int:
+        pending = len(self._pending)
+        self._pending = [row for row in self._pending if row[0] != channel_id]
+        pending -= len(self._pending)
+        self._seqs.pop(channel_id, None)
+        if not self._pending:
+            self._pending_since = None
+
+        try:
+            with self._conn:
+                cursor = self._conn.execute('''
+                DELETE FROM channel_messages WHERE channel_id = ?
+                ''', (channel_id,))
+                self._conn.execute('''
+                DELETE FROM channel_summaries WHERE channel_id = ?
+                ''', (channel_id,))
+            return cursor.rowcount + pending
+        except Exception as e:
+            logger.error(f"Erro ao limpar mensagens do banco de dados: {e}")
+            return pending
+
+    def _clear_all(self) -> int:
+        pending = len(self._pending)
+        self._pending = []
+        self._pending_since = None
+        self._seqs.clear()
+
+        try:
+            with self._conn:
+                cursor = self._conn.execute("DELETE FROM channel_messages")
+                self._conn.execute("DELETE FROM channel_summaries")
+            return cursor.rowcount + pending
+        except Exception as e:
+            logger.error(f"Erro ao limpar todos os históricos do banco de dados: {e}")
+            return pending
+
+    def _purge_guild(self, guild_id: str, channel_ids: List[str]) -> int:
+        channels = set(channel_ids)
+        pending = len(self._pending)
+        self._pending = [row for row in self._pending if row[1] != guild_id and row[0] not in channels]
+        pending -= len(self._pending)
+        if not self._pending:
+            self._pending_since = None
+
+        try:
+            with self._conn:
+                self._conn.execute('''
+                DELETE FROM channel_summaries WHERE channel_id IN (
+                    SELECT DISTINCT channel_id FROM channel_messages WHERE guild_id = ?
+                )
+                ''', (guild_id,))
+                cursor = self._conn.execute('''
+                DELETE FROM channel_messages WHERE guild_id = ?
+                ''', (guild_id,))
+                deleted = cursor.rowcount
+
+                # Linhas sem guild_id só existem em bancos anteriores à coluna; na maioria
+                # das vezes não há nenhuma e a lista de canais nem chega ao banco.
+                legacy = self._conn.execute(
+                    "SELECT 1 FROM channel_messages WHERE guild_id IS NULL LIMIT 1"
+                ).fetchone()
+                if channels and legacy:
+                    self._conn.execute(
+                        "CREATE TEMP TABLE IF NOT EXISTS purge_channels (channel_id TEXT PRIMARY KEY)"
+                    )
+                    self._conn.execute("DELETE FROM purge_channels")
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO purge_channels (channel_id) VALUES (?)",
+                        [(channel_id,) for channel_id in channels]
+                    )
+                    self._conn.execute('''
+                    DELETE FROM channel_summaries WHERE channel_id IN (
+                        SELECT channel_id FROM channel_messages
+                        WHERE guild_id IS NULL AND channel_id IN purge_channels
+                    )
+                    ''')
+                    cursor = self._conn.execute('''
+                    DELETE FROM channel_messages
+                    WHERE guild_id IS NULL AND channel_id IN purge_channels
+                    ''')
+                    deleted += cursor.rowcount
+                    self._conn.execute("DELETE FROM purge_channels")
+        except Exception as e:
+            logger.error(f"Erro ao apagar as mensagens do servidor {guild_id} do banco de dados: {e}")
+            return pending
+
+        for channel_id in [channel_id for channel_id in self._seqs if channel_id in channels]:
+            del self._seqs[channel_id]
+        return deleted + pending
+
+    def _cleanup(self, max_age_seconds: int) -> int:
+        self._flush()
+
+        try:
+            cutoff_time = time.time() - max_age_seconds
+            with self._conn:
+                cursor = self._conn.execute('''
+                DELETE FROM channel_messages WHERE timestamp < ?
+                ''', (cutoff_time,))
+                self._conn.execute('''
+                DELETE FROM channel_summaries WHERE updated_at < ?
+                ''', (cutoff_time,))
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Erro ao limpar mensagens antigas do banco de dados: {e}")
+            return 0
+
+    def _put_summary(self, channel_id: str, summary: str, until: float) -> None:
+        try:
+            with self._conn:
+                self._conn.execute('''
+                INSERT OR REPLACE INTO channel_summaries (channel_id, summary, summarized_until, updated_at)
+                VALUES (?, ?, ?, ?)
+                ''', (channel_id, summary, until, time.time()))
+        except Exception as e:
+            logger.error(f"Erro ao salvar resumo do canal no banco de dados: {e}")
+
+    def _load_summary(self, channel_id: str) -> Optional[Tuple[str, float]]:
+        try:
+            row = self._conn.execute('''
+            SELECT summary, summarized_until FROM channel_summaries WHERE channel_id = ?
+            ''', (channel_id,)).fetchone()
+        except Exception as e:
+            logger.error(f"Erro ao carregar resumo do canal do banco de dados: {e}")
+            return None
+
+        return tuple(row) if row else None
+
+    def _load_summaries(self, since: float) -> Dict[str, Tuple[str, float]]:
+        try:
+            rows = self._conn.execute('''
+            SELECT channel_id, summary, summarized_until FROM channel_summaries WHERE updated_at >= ?
+            ''', (since,)).fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao carregar resumos dos canais do banco de dados: {e}")
+            return {}
+
+        return {channel_id: (summary, until) for channel_id, summary, until in rows}
+
+    def _put_cached_response(self, key: str, response: str, created_at: float) -> None:
+        try:
+            with self._conn:
+                self._conn.execute('''
+                INSERT OR REPLACE INTO response_cache (key, response, created_at)
+                VALUES (?, ?, ?)
+                ''', (key, response, created_at))
+        except Exception as e:
+            logger.error(f"Erro ao salvar resposta em cache no banco de dados: {e}")
+
+    def _load_cached_responses(self, limit: int, since: float) -> List[Tuple[str, str, float]]:
+        try:
+            return self._conn.execute('''
+            SELECT key, response, created_at FROM response_cache
+            WHERE created_at >= ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            ''', (since, limit)).fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao carregar respostas em cache do banco de dados: {e}")
+            return []
+
+    def _purge_cached_responses(self, before: float) -> int:
+        try:
+            with self._conn:
+                cursor = self._conn.execute('''
+                DELETE FROM response_cache WHERE created_at < ?
+                ''', (before,))
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Erro ao limpar respostas em cache do banco de dados: {e}")
+            return 0
@@ -3,6 +3,8 @@ from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+_system_message = None
+
 DEFAULT_PERSONALITY = """Você é um deputado federal conhecido por suas promessas grandiosas e pela habilidade de nunca admitir erros. Você sempre exagera suas conquistas, inventa estatísticas impressionantes na hora, e desvia de perguntas difíceis com maestria. Quando confrontado, você muda de assunto ou culpa a oposição. Você fala com um tom formal e pomposo, usa jargões políticos excessivamente, e sempre menciona 'projetos importantes' que estão 'em andamento'. Você tem uma memória seletiva conveniente e frequentemente contradiz suas próprias declarações anteriores. Apesar de tudo, você se considera o político mais honesto e trabalhador da história. Mantenha esse personagem em todas as suas respostas, sem quebrar o papel."""
 
 def get_personality():
@@ -15,13 +17,24 @@ def get_personality():
     return personality
 
 def set_personality(new_personality):
+    global _system_message
+
     os.environ["BOT_PERSONALITY"] = new_personality
+    _system_message = None
     logger.info("Personalidade do bot atualizada")
     logger.debug(f"Nova personalidade: {new_personality}")
     return True
 
 def create_system_message():
-    return {
-        "role": "system",
-        "content": get_personality()
-    }
+    """
+    Mensagem de sistema com a personalidade atual. O resultado fica em cache até a
+    próxima chamada de set_personality e não deve ser modificado por quem o recebe.
+    """
+    global _system_message
+
+    if _system_message is None:
+        _system_message = {
+            "role": "system",
+            "content": get_personality()
+        }
+    return _system_message
@@ -0,0 +1,115 @@
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai.persistence import MessagePersistence
+
+logger = get_logger(__name__)
+
+CACHE_REQUESTS = metrics.counter(
+    "ai_response_cache_requests_total",
+    "Consultas aos caches de resposta por resultado",
+    labelnames=("cache", "result")
+)
+
+class ResponseCache:
+    """
+    Cache de respostas para prompts idênticos.
+
+    A chave é o hash do prompt montado (mensagem de sistema + contexto) junto com os
+    modelos, a temperatura e `max_tokens`. Guarda até `max_entries` respostas em memória,
+    descarta a menos usada quando enche e ignora entradas mais velhas que `ttl_seconds`.
+    Com um MessagePersistence anexado, as respostas também vão para a tabela
+    `response_cache` do SQLite e são recarregadas na inicialização.
+    """
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.persistence: Optional[MessagePersistence] = None
+
+    @property
+    def enabled(self) -> bool:
+        config = get_config()
+        if not config.response_cache_enabled:
+            return False
+        return (config.temperature <= config.response_cache_max_temperature
+                or config.response_cache_allow_high_temperature)
+
+    def key(self, messages: List[Dict[str, str]]) -> str:
+        config = get_config()
+        payload = json.dumps(
+            [messages, config.ai_model, config.openai_model, config.temperature, config.max_tokens],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+
+        if entry is not None and time.time() - entry[1] > get_config().response_cache_ttl:
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            CACHE_REQUESTS.inc(cache="exact", result="miss")
+            return None
+
+        self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(cache="exact", result="hit")
+        return entry[0]
+
+    def set(self, key: str, response: str) -> None:
+        created_at = time.time()
+        self._entries[key] = (response, created_at)
+        self._entries.move_to_end(key)
+        self._evict()
+
+        config = get_config()
+        if self.persistence is not None and config.response_cache_persist:
+            self.persistence.put_cached_response(key, response, created_at)
+
+    async def load(self, persistence: Optional[MessagePersistence]) -> int:
+        """
+        Anexa o banco de dados e recarrega as respostas ainda válidas.
+        """
+        self.persistence = persistence
+        config = get_config()
+
+        if persistence is None or not config.response_cache_persist or not self.enabled:
+            return 0
+
+        rows = await persistence.load_cached_responses(
+            config.response_cache_max_entries,
+            time.time() - config.response_cache_ttl
+        )
+        for key, response, created_at in reversed(rows):
+            self._entries[key] = (response, created_at)
+
+        logger.info(f"Cache de respostas carregado com {len(rows)} entradas")
+        return len(rows)
+
+    async def cleanup(self) -> int:
+        cutoff = time.time() - get_config().response_cache_ttl
+        expired = [key for key, (_, created_at) in self._entries.items() if created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+
+        if self.persistence is not None:
+            await self.persistence.purge_cached_responses(cutoff)
+
+        return len(expired)
+
+    def _evict(self) -> None:
+        max_entries = get_config().response_cache_max_entries
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+response_cache = ResponseCache()
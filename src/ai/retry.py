@@ -0,0 +1,178 @@
+import sys
+import time
+import random
+import asyncio
+import email.utils
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai.deadline import Deadline, DeadlineExceeded
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+ATTEMPTS = metrics.counter(
+    "ai_provider_attempts_total",
+    "Tentativas individuais de chamada aos provedores, por resultado",
+    labelnames=("provider", "result")
+)
+BACKOFF = metrics.histogram(
+    "ai_provider_backoff_seconds",
+    "Espera antes de repetir uma chamada que falhou",
+    labelnames=("provider",)
+)
+
+# Os SDKs são importados sob demanda (src.ai.clients); um SDK que ainda não foi
+# carregado não pode ter levantado o erro, então classify não precisa importá-lo.
+_SDK_MODULES = ("groq", "openai")
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def classify(error: BaseException) -> Optional[str]:
+    """
+    Motivo pelo qual vale a pena repetir a chamada, ou None se o erro for definitivo
+    (pedido inválido, chave errada, modelo inexistente, prazo do pedido esgotado...).
+    """
+    if isinstance(error, DeadlineExceeded):
+        return None
+
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.TransportError):
+            return "connection"
+
+    for sdk in filter(None, map(sys.modules.get, _SDK_MODULES)):
+        if isinstance(error, sdk.APITimeoutError):
+            return "timeout"
+        if isinstance(error, sdk.APIConnectionError):
+            return "connection"
+        if isinstance(error, sdk.APIStatusError):
+            if error.status_code == 429:
+                return "rate_limit"
+            if error.status_code in (408, 409) or error.status_code >= 500:
+                return "server"
+            return None
+
+    if isinstance(error, ConnectionError):
+        return "connection"
+
+    return None
+
+def _parse_duration(value: str) -> Optional[float]:
+    """
+    Lê durações como "2", "1.5s", "250ms" ou "1m30.5s", usadas nos cabeçalhos
+    `x-ratelimit-reset-*`.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total, number = 0.0, ""
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char.isdigit() or char == ".":
+            number += char
+            index += 1
+            continue
+
+        unit = "ms" if value.startswith("ms", index) else char
+        if unit not in _DURATION_UNITS or not number:
+            return None
+        total += float(number) * _DURATION_UNITS[unit]
+        number = ""
+        index += len(unit)
+
+    return total if not number else None
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Espera pedida pelo provedor nos cabeçalhos da resposta de erro, em segundos.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    resets = [
+        _parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+async def with_retries(provider: str, call: Callable[[float], Awaitable[T]],
+                       deadline: Optional[Deadline] = None) -> T:
+    """
+    Chama `call(timeout)` repetindo os erros transitórios com backoff exponencial e jitter
+    decorrelacionado, respeitando `Retry-After` e os cabeçalhos de reset de limite de taxa.
+    As tentativas em um provedor duram no máximo `retry_deadline` segundos e nunca passam
+    do prazo do pedido, e cada uma recebe como timeout apenas o tempo que ainda resta.
+    """
+    config = get_config()
+    if deadline is None:
+        deadline = Deadline(config.retry_deadline)
+    else:
+        deadline = deadline.limit(config.retry_deadline)
+
+    delay = config.retry_base_delay
+    attempt = 1
+    while True:
+        timeout = deadline.timeout(config.response_timeout)
+        try:
+            if timeout <= 0:
+                raise DeadlineExceeded(f"tentativa {attempt} em {provider}")
+            result = await call(timeout)
+        except Exception as e:
+            reason = classify(e)
+            if reason is None or attempt >= config.retry_max_attempts:
+                ATTEMPTS.inc(provider=provider, result=reason or "fatal")
+                raise
+
+            delay = min(config.retry_max_delay, random.uniform(config.retry_base_delay, delay * 3))
+            hint = retry_after(e)
+            wait = max(delay, hint) if hint is not None else delay
+
+            if wait >= deadline.remaining():
+                ATTEMPTS.inc(provider=provider, result=reason)
+                logger.warning(f"Sem tempo para repetir a chamada a {provider} ({reason}), desistindo")
+                raise
+
+            ATTEMPTS.inc(provider=provider, result=reason)
+            BACKOFF.observe(wait, provider=provider)
+            logger.warning(f"Erro transitório em {provider} ({reason}), tentativa {attempt + 1} em {wait:.2f}s: {e}")
+            await asyncio.sleep(wait)
+            attempt += 1
+            continue
+
+        ATTEMPTS.inc(provider=provider, result="success")
+        return result
@@ -0,0 +1,327 @@
+import time
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple, TypeVar
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai import groq as groq_provider
+from src.ai import openai as openai_provider
+from src.ai.latency import LatencyWindow
+from src.ai.health import CircuitBreaker
+from src.ai.scheduler import request_scheduler
+from src.ai.deadline import Deadline, DeadlineExceeded
+from src.ai.tokens import count_message_tokens
+from src.ai.response_cache import response_cache
+from src.ai.similarity import similarity_scope, lookup_similar, remember_similar
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+PROVIDER_LATENCY = metrics.histogram(
+    "ai_provider_latency_seconds",
+    "Latência de cada provedor até a resposta completa ou o primeiro pedaço do streaming",
+    labelnames=("provider",)
+)
+PROVIDER_REQUESTS = metrics.counter(
+    "ai_provider_requests_total",
+    "Chamadas aos provedores de IA por resultado",
+    labelnames=("provider", "outcome")
+)
+HEDGED_REQUESTS = metrics.counter(
+    "ai_hedged_requests_total",
+    "Pedidos em que a OpenAI foi disparada em paralelo à Groq, por vencedor",
+    labelnames=("winner",)
+)
+ROUTED_REQUESTS = metrics.counter(
+    "ai_routed_requests_total",
+    "Pedidos respondidos por cada provedor, pelo caminho: primary, fallback (após erro), hedge ou circuit_open",
+    labelnames=("provider", "path")
+)
+
+PROVIDER_NAMES = {
+    "groq": "Groq",
+    "openai": "OpenAI"
+}
+
+_latencies: Dict[str, LatencyWindow] = {provider: LatencyWindow() for provider in PROVIDER_NAMES}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def hedge_delay(provider: str = "groq") -> float:
+    """
+    Tempo de espera pelo provedor principal antes de disparar o outro em paralelo,
+    derivado do quantil `hedge_quantile` das latências recentes do principal.
+    """
+    config = get_config()
+    window = _latencies[provider]
+
+    if len(window) < config.hedge_min_samples:
+        return config.hedge_delay
+
+    delay = window.quantile(config.hedge_quantile)
+    return min(max(delay, config.hedge_min_delay), config.hedge_max_delay)
+
+def _breaker(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        config = get_config()
+        breaker = _breakers[provider] = CircuitBreaker(
+            PROVIDER_NAMES[provider],
+            window_seconds=config.breaker_window_seconds,
+            min_requests=config.breaker_min_requests,
+            error_threshold=config.breaker_error_threshold,
+            slow_call_seconds=config.breaker_slow_call_seconds,
+            open_seconds=config.breaker_open_seconds,
+            half_open_probes=config.breaker_half_open_probes
+        )
+    return breaker
+
+def get_provider_health() -> List[Dict[str, Any]]:
+    return [_breaker(provider).snapshot() for provider in PROVIDER_NAMES]
+
+def provider_available(provider: str) -> bool:
+    """
+    Se o disjuntor do provedor aceitaria uma chamada agora, sem reservar a vaga.
+    """
+    return _breaker(provider).available()
+
+def _request_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Tokens que um pedido consome da cota do provedor: o prompt mais o máximo da resposta.
+    """
+    return sum(count_message_tokens(message) for message in messages) + get_config().max_tokens
+
+async def _attempt(provider: str, call: Callable[[], Awaitable[T]],
+                   guild_id: Optional[str] = None, tokens: int = 0,
+                   deadline: Optional[Deadline] = None, reserved: bool = True) -> T:
+    """
+    Chama o provedor depois de esperar a vez no agendador. Com `reserved`, a vaga já foi
+    reservada no disjuntor por `try_acquire` e é devolvida se a chamada nem começar.
+    """
+    breaker = _breaker(provider)
+    try:
+        if deadline is not None:
+            deadline.check(f"chamada a {PROVIDER_NAMES[provider]}")
+        await request_scheduler.acquire(provider, guild_id, tokens, deadline)
+    except BaseException:
+        if reserved:
+            breaker.on_cancel()
+        raise
+
+    start = time.perf_counter()
+    outcome = "error"
+
+    try:
+        result = await call()
+        outcome = "success"
+        return result
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if outcome == "success":
+            breaker.on_success(elapsed)
+        elif outcome == "error":
+            breaker.on_failure(elapsed)
+        else:
+            breaker.on_cancel()
+
+        if outcome != "error":
+            # Uma tentativa cancelada demorou pelo menos `elapsed`; contar o valor
+            # evita que a janela esqueça justamente as chamadas lentas.
+            _latencies[provider].observe(elapsed)
+            PROVIDER_LATENCY.observe(elapsed, provider=provider)
+        PROVIDER_REQUESTS.inc(provider=provider, outcome=outcome)
+
+def _route(attempts: List[Tuple[str, Callable[[], Awaitable[T]]]]) -> Tuple[List[Tuple[str, Callable[[], Awaitable[T]]]], bool]:
+    """
+    Escolhe o primeiro provedor cujo disjuntor aceita a chamada e já reserva a vaga dele.
+    Os provedores seguintes ficam para fallback e hedge, reservados só se forem usados.
+
+    Returns:
+        As tentativas a partir do escolhido e se a vaga do primeiro foi reservada
+    """
+    for index, (provider, _) in enumerate(attempts):
+        if _breaker(provider).try_acquire():
+            if index:
+                logger.info(f"Circuito de {PROVIDER_NAMES[attempts[0][0]]} aberto, usando {PROVIDER_NAMES[provider]} diretamente")
+            return attempts[index:], True
+
+    logger.warning("Todos os provedores estão com o circuito aberto, tentando o principal mesmo assim")
+    return attempts[:1], False
+
+async def _race(attempts: List[Tuple[str, Callable[[], Awaitable[T]]]],
+                discard: Optional[Callable[[T], Awaitable[None]]] = None,
+                guild_id: Optional[str] = None, tokens: int = 0,
+                deadline: Optional[Deadline] = None) -> T:
+    rerouted, reserved = _route(attempts)
+    path = "circuit_open" if rerouted[0][0] != attempts[0][0] else "primary"
+    attempts = rerouted
+
+    if len(attempts) == 1:
+        result = await _attempt(*attempts[0], guild_id, tokens, deadline, reserved)
+        ROUTED_REQUESTS.inc(provider=attempts[0][0], path=path)
+        return result
+
+    config = get_config()
+    (primary_name, primary), (secondary_name, secondary) = attempts
+    first = asyncio.ensure_future(_attempt(primary_name, primary, guild_id, tokens, deadline))
+    tasks = [first]
+
+    try:
+        timeout = hedge_delay(primary_name) if config.hedge_requests else None
+        done, _ = await asyncio.wait({first}, timeout=timeout)
+
+        if first in done:
+            if first.exception() is None:
+                ROUTED_REQUESTS.inc(provider=primary_name, path=path)
+                return first.result()
+            if not _breaker(secondary_name).try_acquire():
+                raise first.exception()
+            logger.warning(f"Erro ao usar {PROVIDER_NAMES[primary_name]}, tentando {PROVIDER_NAMES[secondary_name]}: {first.exception()}")
+            result = await _attempt(secondary_name, secondary, guild_id, tokens, deadline)
+            ROUTED_REQUESTS.inc(provider=secondary_name, path="fallback")
+            return result
+
+        if not _breaker(secondary_name).try_acquire():
+            result = await first
+            ROUTED_REQUESTS.inc(provider=primary_name, path=path)
+            return result
+
+        logger.info(f"{PROVIDER_NAMES[primary_name]} ainda não respondeu, disparando {PROVIDER_NAMES[secondary_name]} em paralelo")
+        second = asyncio.ensure_future(_attempt(secondary_name, secondary, guild_id, tokens, deadline))
+        tasks.append(second)
+
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+
+            if winner is None:
+                error = next(iter(done)).exception()
+                continue
+
+            for task in done:
+                if task is not winner and task.exception() is None and discard is not None:
+                    await discard(task.result())
+
+            HEDGED_REQUESTS.inc(winner=primary_name if winner is first else secondary_name)
+            if winner is first:
+                ROUTED_REQUESTS.inc(provider=primary_name, path=path)
+            else:
+                ROUTED_REQUESTS.inc(provider=secondary_name, path="hedge")
+            return winner.result()
+
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def _lookup_caches(messages: List[Dict[str, str]], channel_id: Optional[str], guild_id: Optional[str],
+                   question: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Consulta o cache exato e depois o de perguntas parecidas.
+
+    Returns:
+        Chave do cache exato, escopo de similaridade e a resposta encontrada (ou None)
+    """
+    cache_key = response_cache.key(messages) if response_cache.enabled else None
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, None, cached
+
+    scope = similarity_scope(channel_id, guild_id, messages[0]["content"]) if question else None
+    return cache_key, scope, lookup_similar(scope, question)
+
+def _remember(cache_key: Optional[str], scope: Optional[str], question: Optional[str], response: str) -> None:
+    if not response:
+        return
+    if cache_key is not None:
+        response_cache.set(cache_key, response)
+    remember_similar(scope, question, response)
+
+async def generate_response(messages: List[Dict[str, str]], channel_id: Optional[str] = None,
+                            guild_id: Optional[str] = None, question: Optional[str] = None,
+                            deadline: Optional[Deadline] = None) -> str:
+    """
+    Gera uma resposta com a Groq. Se ela falhar, recorre à OpenAI; se demorar mais que o
+    atraso de hedge, dispara a OpenAI em paralelo e fica com a primeira que responder.
+    Provedores com o circuito aberto são pulados, e cada chamada espera a sua vez no
+    agendador de pedidos do provedor. Prompts idênticos a um já respondido
+    são servidos pelo cache de respostas e, se `question` for informada, perguntas
+    parecidas com uma anterior do mesmo canal ou servidor reaproveitam a resposta dela.
+    Todas as etapas, inclusive o fallback, dividem o prazo `deadline` do pedido.
+    """
+    cache_key, scope, cached = _lookup_caches(messages, channel_id, guild_id, question)
+    if cached is not None:
+        return cached
+
+    response = await _race([
+        ("groq", lambda: groq_provider.generate_response(messages, deadline)),
+        ("openai", lambda: openai_provider.generate_response(messages, deadline))
+    ], guild_id=guild_id, tokens=_request_tokens(messages), deadline=deadline)
+
+    _remember(cache_key, scope, question, response)
+    return response
+
+async def _open_stream(stream: Callable[[List[Dict[str, str]], Optional[Deadline]], AsyncIterator[str]],
+                       messages: List[Dict[str, str]], deadline: Optional[Deadline]) -> Tuple[str, AsyncIterator[str]]:
+    chunks = stream(messages, deadline)
+    try:
+        return await chunks.__anext__(), chunks
+    except StopAsyncIteration:
+        # Uma resposta vazia é um sucesso do provedor, não uma falha para o disjuntor.
+        return "", chunks
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+async def _close_stream(opened: Tuple[str, AsyncIterator[str]]) -> None:
+    await opened[1].aclose()
+
+async def _next_chunk(chunks: AsyncIterator[str], deadline: Optional[Deadline]) -> str:
+    if deadline is None:
+        return await chunks.__anext__()
+    try:
+        return await asyncio.wait_for(chunks.__anext__(), deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("streaming da resposta")
+
+async def stream_response(messages: List[Dict[str, str]], channel_id: Optional[str] = None,
+                          guild_id: Optional[str] = None, question: Optional[str] = None,
+                          deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+    """
+    Transmite a resposta em pedaços. O fallback e o hedge são decididos pelo primeiro
+    pedaço; depois que um provedor começa a responder, os erros são propagados. Um
+    pedaço que não chega antes do prazo `deadline` interrompe o streaming.
+    """
+    cache_key, scope, cached = _lookup_caches(messages, channel_id, guild_id, question)
+    if cached is not None:
+        yield cached
+        return
+
+    first, chunks = await _race([
+        ("groq", lambda: _open_stream(groq_provider.stream_response, messages, deadline)),
+        ("openai", lambda: _open_stream(openai_provider.stream_response, messages, deadline))
+    ], discard=_close_stream, guild_id=guild_id, tokens=_request_tokens(messages), deadline=deadline)
+
+    parts = [first]
+    try:
+        if first:
+            yield first
+        while True:
+            try:
+                chunk = await _next_chunk(chunks, deadline)
+            except StopAsyncIteration:
+                break
+            parts.append(chunk)
+            yield chunk
+
+        _remember(cache_key, scope, question, "".join(parts))
+    finally:
+        await chunks.aclose()
@@ -0,0 +1,214 @@
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai.deadline import Deadline, DeadlineExceeded
+
+logger = get_logger(__name__)
+
+QUEUE_DEPTH = metrics.gauge(
+    "ai_scheduler_queue_depth",
+    "Pedidos esperando vaga nos limites de taxa de cada provedor",
+    labelnames=("provider",)
+)
+QUEUE_WAIT = metrics.histogram(
+    "ai_scheduler_wait_seconds",
+    "Tempo de espera na fila do agendador antes de chamar o provedor",
+    labelnames=("provider",)
+)
+QUEUE_REJECTED = metrics.counter(
+    "ai_scheduler_rejected_total",
+    "Pedidos recusados porque a fila do provedor estava cheia",
+    labelnames=("provider",)
+)
+
+DEFAULT_GUILD = "dm"
+
+class QueueFullError(Exception):
+    """
+    A fila do provedor atingiu `scheduler_max_queue_depth`.
+    """
+    def __init__(self, provider: str):
+        super().__init__(f"Fila de pedidos para {provider} está cheia")
+        self.provider = provider
+
+class TokenBucket:
+    """
+    Balde de fichas reabastecido continuamente até `per_minute` fichas por minuto.
+    Com `per_minute` igual a 0 o balde é ilimitado.
+    """
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def delay(self, amount: float) -> float:
+        if not self.capacity:
+            return 0.0
+
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.capacity:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+class ProviderQueue:
+    """
+    Fila de pedidos de um provedor, limitada por pedidos e tokens por minuto.
+
+    Cada servidor tem a sua própria fila, e as vagas são distribuídas entre os servidores
+    em round robin ponderado: um servidor com peso N é atendido até N vezes seguidas antes
+    de passar a vez. Assim um servidor movimentado não consome sozinho a cota do provedor.
+    """
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int,
+                 max_depth: int, weights: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_depth = max_depth
+        self.weights = weights or {}
+
+        self.depth = 0
+        self._queues: Dict[str, Deque[Tuple[int, asyncio.Future]]] = {}
+        self._order: Deque[str] = deque()
+        self._credits: Dict[str, int] = {}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, guild_id: Optional[str], tokens: int, deadline: Optional[Deadline] = None) -> None:
+        """
+        Espera até que o pedido caiba nos limites do provedor e consome a sua cota.
+
+        Raises:
+            QueueFullError: Se já houver `max_depth` pedidos esperando
+            DeadlineExceeded: Se o prazo do pedido acabar ainda na fila
+        """
+        if self._dispatcher is None and self._delay(tokens) == 0:
+            self._take(tokens)
+            QUEUE_WAIT.observe(0.0, provider=self.name)
+            return
+
+        if self.depth >= self.max_depth:
+            QUEUE_REJECTED.inc(provider=self.name)
+            raise QueueFullError(self.name)
+
+        guild = guild_id or DEFAULT_GUILD
+        future = asyncio.get_running_loop().create_future()
+        if guild not in self._queues:
+            self._queues[guild] = deque()
+            self._order.append(guild)
+        self._queues[guild].append((tokens, future))
+        self._set_depth(self.depth + 1)
+
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, deadline.remaining() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            self._set_depth(self.depth - 1)
+            raise DeadlineExceeded(f"fila de {self.name}")
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._set_depth(self.depth - 1)
+            raise
+        QUEUE_WAIT.observe(time.perf_counter() - start, provider=self.name)
+
+    async def _dispatch(self) -> None:
+        try:
+            while True:
+                waiter = self._next_waiter()
+                if waiter is None:
+                    return
+
+                tokens, future = waiter
+                delay = self._delay(tokens)
+                while delay > 0 and not future.done():
+                    await asyncio.sleep(delay)
+                    delay = self._delay(tokens)
+
+                if future.done():
+                    continue
+
+                self._take(tokens)
+                self._set_depth(self.depth - 1)
+                future.set_result(None)
+        finally:
+            self._dispatcher = None
+
+    def _next_waiter(self) -> Optional[Tuple[int, asyncio.Future]]:
+        while self._order:
+            guild = self._order[0]
+            queue = self._queues[guild]
+            while queue and queue[0][1].done():
+                queue.popleft()
+
+            if not queue:
+                self._order.popleft()
+                del self._queues[guild]
+                self._credits.pop(guild, None)
+                continue
+
+            credits = self._credits.get(guild) or self.weights.get(guild, 1)
+            if credits > 1:
+                self._credits[guild] = credits - 1
+            else:
+                self._credits.pop(guild, None)
+                self._order.rotate(-1)
+            return queue.popleft()
+
+        return None
+
+    def _delay(self, tokens: int) -> float:
+        return max(self.requests.delay(1), self.tokens.delay(tokens))
+
+    def _take(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def _set_depth(self, depth: int) -> None:
+        self.depth = depth
+        QUEUE_DEPTH.set(depth, provider=self.name)
+
+class RequestScheduler:
+    """
+    Agendador central dos pedidos aos provedores de IA, com uma ProviderQueue por
+    provedor configurada a partir de `<provedor>_requests_per_minute` e
+    `<provedor>_tokens_per_minute`.
+    """
+    def __init__(self):
+        self._queues: Dict[str, ProviderQueue] = {}
+
+    def queue(self, provider: str) -> ProviderQueue:
+        queue = self._queues.get(provider)
+        if queue is None:
+            config = get_config()
+            queue = self._queues[provider] = ProviderQueue(
+                provider,
+                requests_per_minute=getattr(config, f"{provider}_requests_per_minute"),
+                tokens_per_minute=getattr(config, f"{provider}_tokens_per_minute"),
+                max_depth=config.scheduler_max_queue_depth,
+                weights=config.scheduler_guild_weights
+            )
+        return queue
+
+    async def acquire(self, provider: str, guild_id: Optional[str], tokens: int,
+                      deadline: Optional[Deadline] = None) -> None:
+        await self.queue(provider).acquire(guild_id, tokens, deadline)
+
+request_scheduler = RequestScheduler()
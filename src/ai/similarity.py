@@ -0,0 +1,244 @@
+import re
+import hashlib
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Union
+
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai.response_cache import CACHE_REQUESTS
+
+_MAX_HASH = (1 << 32) - 1
+_EMPTY = _MAX_HASH
+_NON_WORD = re.compile(r"[^\w\s]")
+
+# Abreviações comuns no chat, já sem acentos, expandidas antes de gerar os shingles.
+ABBREVIATIONS = {
+    "oq": "o que", "q": "que", "pq": "por que", "pra": "para", "pro": "para o",
+    "vc": "voce", "vcs": "voces", "tb": "tambem", "tbm": "tambem", "eh": "e",
+    "ta": "esta", "to": "estou", "n": "nao", "nd": "nada", "td": "tudo", "tds": "todos",
+    "mt": "muito", "mto": "muito", "hj": "hoje", "qnd": "quando", "qdo": "quando",
+    "msm": "mesmo", "cmg": "comigo", "ngm": "ninguem", "agr": "agora", "dps": "depois",
+    "vdd": "verdade", "sla": "sei la",
+}
+
+SIMILARITY_ENTRIES = metrics.gauge(
+    "ai_similarity_cache_entries",
+    "Perguntas guardadas no cache de perguntas parecidas"
+)
+
+def normalize(text: str) -> str:
+    """
+    Minúsculas, sem acentos, sem pontuação, com as abreviações comuns expandidas
+    palavra a palavra e espaços colapsados.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = _NON_WORD.sub(" ", text).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+class _Entry:
+    __slots__ = ("scope", "signature", "shingles", "response")
+
+    def __init__(self, scope: str, signature: array, shingles: array, response: str):
+        self.scope = scope
+        self.signature = signature
+        self.shingles = shingles
+        self.response = response
+
+class SimilarityCache:
+    """
+    Índice local de perguntas parecidas, baseado em MinHash com LSH sobre shingles de
+    caracteres.
+
+    Cada pergunta vira uma assinatura de `num_perm` valores mínimos de hash, dividida em
+    `bands` faixas. Perguntas que coincidem em pelo menos uma faixa do mesmo escopo são
+    candidatas; cada candidata guarda também os seus shingles, e a similaridade de
+    Jaccard é calculada exatamente só para elas, já que a estimativa pela assinatura
+    oscila demais perto do limiar em perguntas curtas. O índice guarda no máximo `max_entries` perguntas, descartando a menos usada.
+
+    Perguntas com menos de `min_shingles` shingles depois de normalizadas são curtas
+    demais para a estimativa ser confiável e ficam fora do índice.
+
+    Quase todas as faixas pertencem a uma única pergunta, então cada balde guarda o id
+    diretamente e só vira um conjunto quando uma segunda pergunta cai nele.
+    """
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 min_shingles: int = 10, max_entries: int = 10000):
+        if num_perm % bands:
+            raise ValueError("num_perm precisa ser múltiplo de bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[int, Union[int, Set[int]]] = {}
+        self._next_id = 0
+
+    def _shingles(self, text: str) -> Set[int]:
+        """
+        Shingles do texto normalizado, ou um conjunto vazio se forem menos que `min_shingles`.
+        """
+        text = normalize(text)
+        size = self.shingle_size
+        if len(text) <= size:
+            shingles = {hash(text) & _MAX_HASH} if text else set()
+        else:
+            shingles = {hash(text[i:i + size]) & _MAX_HASH for i in range(len(text) - size + 1)}
+        return shingles if len(shingles) >= self.min_shingles else set()
+
+    def signature(self, text: str) -> Optional[array]:
+        shingles = self._shingles(text)
+        return self._signature(shingles) if shingles else None
+
+    def _signature(self, shingles: Set[int]) -> array:
+        """
+        Assinatura MinHash de uma permutação só: cada shingle cai em um dos `num_perm`
+        compartimentos e cada compartimento guarda o menor valor que recebeu. Os vazios
+        copiam o próximo compartimento preenchido, para que textos curtos não pareçam
+        iguais só por terem os mesmos compartimentos vazios; o deslocamento pela distância
+        mantém esses valores acima de qualquer mínimo real e dentro de 32 bits.
+        """
+        bins = self.num_perm
+        signature = [_EMPTY] * bins
+        for shingle in shingles:
+            index = shingle % bins
+            value = shingle // bins
+            if value < signature[index]:
+                signature[index] = value
+
+        offset = (_MAX_HASH + 1) // bins
+        filled = list(signature)
+        for index in range(bins):
+            if filled[index] != _EMPTY:
+                continue
+            for distance in range(1, bins):
+                neighbour = filled[(index + distance) % bins]
+                if neighbour != _EMPTY:
+                    signature[index] = neighbour + distance * offset
+                    break
+
+        return array("I", signature)
+
+    def _band_keys(self, scope: str, signature: array) -> List[int]:
+        rows = self.rows
+        return [
+            hash((scope, band, tuple(signature[band * rows:(band + 1) * rows])))
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, scope: str, text: str, threshold: float) -> Optional[str]:
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+        signature = self._signature(shingles)
+
+        candidates: Set[int] = set()
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+
+        best_id, best_score = None, threshold
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry.scope != scope:
+                continue
+
+            common = len(shingles.intersection(entry.shingles))
+            score = common / (len(shingles) + len(entry.shingles) - common)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id].response
+
+    def add(self, scope: str, text: str, response: str) -> None:
+        shingles = self._shingles(text)
+        if not shingles:
+            return
+        signature = self._signature(shingles)
+
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = _Entry(scope, signature, array("I", sorted(shingles)), response)
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = entry_id
+            elif isinstance(bucket, int):
+                self._buckets[key] = {bucket, entry_id}
+            else:
+                bucket.add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(*self._entries.popitem(last=False))
+
+        SIMILARITY_ENTRIES.set(len(self._entries))
+
+    def _remove(self, entry_id: int, entry: _Entry) -> None:
+        for key in self._band_keys(entry.scope, entry.signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                if bucket == entry_id:
+                    del self._buckets[key]
+                continue
+
+            bucket.discard(entry_id)
+            if len(bucket) == 1:
+                self._buckets[key] = bucket.pop()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+_similarity_cache: Optional[SimilarityCache] = None
+
+def get_similarity_cache() -> SimilarityCache:
+    global _similarity_cache
+
+    if _similarity_cache is None:
+        config = get_config()
+        _similarity_cache = SimilarityCache(max_entries=config.similarity_cache_max_entries)
+    return _similarity_cache
+
+def similarity_scope(channel_id: Optional[str], guild_id: Optional[str], personality: str) -> Optional[str]:
+    """
+    Escopo em que perguntas parecidas podem compartilhar resposta: o canal ou o servidor
+    (conforme `similarity_cache_scope`) mais a personalidade atual.
+    """
+    config = get_config()
+    scope_id = guild_id if config.similarity_cache_scope == "guild" and guild_id else channel_id
+    if scope_id is None:
+        return None
+
+    personality_id = hashlib.sha1(personality.encode("utf-8")).hexdigest()[:12]
+    return f"{scope_id}:{personality_id}"
+
+def lookup_similar(scope: Optional[str], question: Optional[str]) -> Optional[str]:
+    config = get_config()
+    if not config.similarity_cache_enabled or scope is None or not question:
+        return None
+
+    response = get_similarity_cache().lookup(scope, question, config.similarity_threshold)
+    CACHE_REQUESTS.inc(cache="similar", result="hit" if response is not None else "miss")
+    return response
+
+def remember_similar(scope: Optional[str], question: Optional[str], response: str) -> None:
+    if not get_config().similarity_cache_enabled or scope is None or not question or not response:
+        return
+    get_similarity_cache().add(scope, question, response)
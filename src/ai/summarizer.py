@@ -0,0 +1,89 @@
+import time
+from typing import List, Optional
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.ai.clients import provider_clients
+from src.ai.deadline import Deadline
+from src.ai.message_record import MessageRecord
+from src.ai.retry import with_retries
+from src.ai.router import provider_available
+from src.ai.scheduler import request_scheduler
+from src.ai.tokens import count_message_tokens
+
+logger = get_logger(__name__)
+
+SUMMARY_QUEUE = "resumos"
+
+SUMMARY_PROMPT = (
+    "Você resume conversas de um canal do Discord para que um assistente possa continuar "
+    "a conversa sem ler o histórico completo. Mantenha nomes, fatos, pedidos em aberto e "
+    "decisões; descarte cumprimentos e repetições. Responda apenas com o resumo, em "
+    "português, em no máximo {words} palavras."
+)
+
+SUMMARIES = metrics.counter(
+    "ai_history_summaries_total",
+    "Compactações do histórico de um canal em resumo, por resultado (success, error ou skipped)",
+    labelnames=("result",)
+)
+SUMMARY_LATENCY = metrics.histogram(
+    "ai_history_summary_seconds",
+    "Tempo para gerar o resumo de um trecho do histórico"
+)
+
+def _transcript(messages: List[MessageRecord]) -> str:
+    lines = []
+    for message in messages:
+        if message.role == "user":
+            lines.append(message.prompt)
+        elif message.role == "assistant":
+            lines.append(f"Assistente: {message.content}")
+    return "\n".join(lines)
+
+async def summarize_history(previous: Optional[str], messages: List[MessageRecord]) -> str:
+    """
+    Gera, com o modelo mais barato `summary_model` da Groq, um resumo que junta o resumo
+    anterior do canal às mensagens mais antigas do histórico.
+
+    Com o disjuntor da Groq aberto, não chama o provedor e devolve um resumo vazio; o
+    histórico fica como está e a compactação é tentada de novo na próxima mensagem.
+    """
+    if not provider_available("groq"):
+        SUMMARIES.inc(result="skipped")
+        logger.debug("Compactação do histórico adiada: disjuntor da Groq aberto")
+        return ""
+
+    config = get_config()
+
+    content = _transcript(messages)
+    if previous:
+        content = f"Resumo anterior:\n{previous}\n\nMensagens seguintes:\n{content}"
+
+    prompt = [
+        {"role": "system", "content": SUMMARY_PROMPT.format(words=config.summary_max_words)},
+        {"role": "user", "content": content}
+    ]
+    tokens = sum(count_message_tokens(message) for message in prompt) + config.summary_max_tokens
+    deadline = Deadline(config.summary_timeout)
+    start = time.perf_counter()
+
+    try:
+        await request_scheduler.acquire("groq", SUMMARY_QUEUE, tokens, deadline)
+
+        client = provider_clients.get_groq()
+        response = await with_retries("groq", lambda timeout: client.chat.completions.create(
+            model=config.summary_model,
+            messages=prompt,
+            temperature=0.2,
+            max_tokens=config.summary_max_tokens,
+            timeout=timeout
+        ), deadline)
+    except Exception:
+        SUMMARIES.inc(result="error")
+        raise
+
+    SUMMARIES.inc(result="success")
+    SUMMARY_LATENCY.observe(time.perf_counter() - start)
+    return (response.choices[0].message.content or "").strip()
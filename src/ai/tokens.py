@@ -0,0 +1,27 @@
+import math
+from typing import Dict
+
+from src.utils.config import get_config
+
+CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def count_tokens(text: str) -> int:
+    """
+    Estimativa barata de tokens de um texto, sem depender do tokenizador de cada modelo.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def count_message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def context_token_budget() -> int:
+    """
+    Orçamento total de tokens de um pedido (prompt + resposta). Como o pedido pode ir
+    para qualquer um dos provedores, vale o menor orçamento entre os modelos configurados.
+    """
+    config = get_config()
+    return min(
+        config.model_token_budgets.get(model, config.context_token_budget)
+        for model in (config.ai_model, config.openai_model)
+    )
@@ -0,0 +1,95 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = metrics.histogram(
+    "bot_mention_batch_size",
+    "Menções respondidas juntas em uma única geração",
+    buckets=(1, 2, 3, 5, 10, 20)
+)
+QUEUE_WAIT = metrics.histogram(
+    "bot_channel_queue_wait_seconds",
+    "Espera na fila do canal até a geração começar, por origem (mention ou command)",
+    labelnames=("source",)
+)
+
+class ChannelQueue:
+    """
+    Serializa a geração de respostas por canal.
+
+    Apenas uma geração por canal roda de cada vez. As menções que chegam enquanto uma
+    geração está em andamento esperam na fila do canal e são entregues juntas, em até
+    `max_batch` por vez, para que uma única resposta atenda todas. Os comandos de chat
+    usam `lock` para entrar na mesma fila sem serem agrupados. Sem `max_batch`, vale
+    `mention_batch_size` da configuração.
+    """
+    def __init__(self, max_batch: Optional[int] = None):
+        self.max_batch = max_batch
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._holders: Dict[str, int] = {}
+        self._pending: Dict[str, List[Tuple[float, Any]]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    @asynccontextmanager
+    async def lock(self, channel_id: str, source: Optional[str] = "command") -> AsyncIterator[None]:
+        lock = self._locks.get(channel_id)
+        if lock is None:
+            lock = self._locks[channel_id] = asyncio.Lock()
+        self._holders[channel_id] = self._holders.get(channel_id, 0) + 1
+
+        start = time.perf_counter()
+        try:
+            async with lock:
+                if source is not None:
+                    QUEUE_WAIT.observe(time.perf_counter() - start, source=source)
+                yield
+        finally:
+            self._holders[channel_id] -= 1
+            if not self._holders[channel_id]:
+                del self._holders[channel_id]
+                del self._locks[channel_id]
+
+    def submit(self, channel_id: str, item: Any, handler: Callable[[List[Any]], Awaitable[None]]) -> None:
+        """
+        Coloca o item na fila do canal. O `handler` recebe a lista de itens acumulados
+        desde a última geração, na ordem de chegada.
+        """
+        self._pending.setdefault(channel_id, []).append((time.perf_counter(), item))
+
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id, handler))
+
+    async def _drain(self, channel_id: str, handler: Callable[[List[Any]], Awaitable[None]]) -> None:
+        try:
+            while self._pending.get(channel_id):
+                async with self.lock(channel_id, source=None):
+                    pending = self._pending[channel_id]
+                    max_batch = self.max_batch or get_config().mention_batch_size
+                    self._pending[channel_id] = pending[max_batch:]
+
+                    now = time.perf_counter()
+                    batch = []
+                    for arrived_at, item in pending[:max_batch]:
+                        QUEUE_WAIT.observe(now - arrived_at, source="mention")
+                        batch.append(item)
+
+                    BATCH_SIZE.observe(len(batch))
+                    if len(batch) > 1:
+                        logger.info(f"Respondendo {len(batch)} menções juntas no canal {channel_id}")
+
+                    try:
+                        await handler(batch)
+                    except Exception as e:
+                        logger.error(f"Erro ao processar menções do canal {channel_id}: {e}")
+        finally:
+            self._pending.pop(channel_id, None)
+            del self._workers[channel_id]
+
+channel_queue = ChannelQueue()
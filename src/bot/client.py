@@ -1,13 +1,30 @@
-from ai.personality import get_personality
+import time
 import discord
 from discord.ext import commands
 from discord.ext import tasks
 
 from src.utils.logger import get_logger
 from src.ai.message_manager import message_manager
+from src.ai.clients import provider_clients
+from src.ai.router import generate_response, stream_response
+from src.ai.response_cache import response_cache
+from src.bot.streaming import StreamingReply
+from src.ai.scheduler import QueueFullError
+from src.bot.channel_queue import channel_queue
+from src.bot.outbound import send_response, get_rate_limiter
+from src.ai.deadline import Deadline, DeadlineExceeded
+from src.bot.commands import BUSY_MESSAGE, TIMEOUT_MESSAGE, MESSAGES_RECEIVED, setup
+from src.ai.personality import get_personality
+from src.utils.startup import startup_profile
+from src.bot.command_sync import command_sync
 
 logger = get_logger(__name__)
 
+COALESCED_MENTIONS_PROMPT = (
+    "Várias pessoas mencionaram você ao mesmo tempo. Responda a todas as mensagens "
+    "desde a sua última resposta em uma única mensagem, dirigindo-se a cada pessoa pelo nome."
+)
+
 def create_bot(config):
     intents = discord.Intents.default()
     intents.message_content = True
@@ -22,6 +39,22 @@ def create_bot(config):
         description=config.description
     )
 
+    async def setup_hook():
+        # Roda uma única vez, depois do login e antes de conectar ao gateway; on_ready
+        # dispara de novo a cada reconexão completa.
+        startup_profile.mark("login")
+
+        await setup(bot)
+        await command_sync.sync_global(bot)
+
+        provider_clients.preload(open_connections=config.prewarm_connections)
+
+        cleanup_old_data.start()
+        evict_stores.start()
+        startup_profile.mark("setup_hook")
+
+    bot.setup_hook = setup_hook
+
     @bot.event
     async def on_ready():
         logger.info(f"Bot conectado como {bot.user.name} (ID: {bot.user.id})")
@@ -33,13 +66,13 @@ def create_bot(config):
         )
         await bot.change_presence(activity=activity)
 
-        from src.bot.commands import setup
-        setup(bot)
-
-        from src.bot.commands import register_commands
-        await register_commands(bot)
+        if not bot.guilds:
+            logger.warning("Bot não está presente em nenhum servidor ainda")
+        await command_sync.sync_guilds(bot, bot.guilds)
 
         logger.info("Bot está pronto para uso!")
+        startup_profile.mark("gateway e on_ready")
+        startup_profile.report()
 
     @bot.event
     async def on_command_error(ctx, error):
@@ -57,6 +90,83 @@ def create_bot(config):
         logger.error(f"Erro no comando {ctx.command}: {error}")
         await ctx.send("❌ Ocorreu um erro ao processar o comando.")
 
+    def mention_text(message):
+        return message.content.replace(f'<@{bot.user.id}>', '').strip()
+
+    async def answer_mentions(batch):
+        # Menções cujo prazo acabou na fila não entram no histórico nem na resposta.
+        live = []
+        for item in batch:
+            mention, _, mention_deadline = item
+            if not mention_deadline.expired:
+                live.append(item)
+                continue
+
+            logger.warning(f"Menção descartada no canal {mention.channel.id}: prazo esgotado na fila do canal")
+            try:
+                await mention.reply(TIMEOUT_MESSAGE)
+            except Exception as e:
+                logger.error(f"Erro ao avisar sobre menção expirada: {e}")
+
+        if not live:
+            return
+
+        started_at = live[0][1]
+        message, _, deadline = live[-1]
+        channel_id = str(message.channel.id)
+        guild_id = str(message.guild.id) if message.guild else None
+        store = await message_manager.get_store(channel_id, guild_id)
+
+        for mention, _, _ in live:
+            await store.add_user_message(
+                str(mention.author.id),
+                mention.author.display_name,
+                mention_text(mention)
+            )
+
+        messages = store.get_messages()
+        question = mention_text(message)
+        if len(live) > 1:
+            messages.append({"role": "system", "content": COALESCED_MENTIONS_PROMPT})
+            question = None
+
+        async with message.channel.typing():
+            try:
+                deadline.check("fila do canal")
+
+                if config.stream_responses:
+                    reply = StreamingReply(
+                        message.reply,
+                        message.channel.send,
+                        edit_interval=config.stream_edit_interval,
+                        started_at=started_at,
+                        channel_id=channel_id
+                    )
+                    response = await reply.consume(stream_response(
+                        messages, channel_id=channel_id, guild_id=guild_id, question=question,
+                        deadline=deadline
+                    ))
+                    await store.add_assistant_message(response)
+                    return
+
+                response = await generate_response(
+                    messages, channel_id=channel_id, guild_id=guild_id, question=question,
+                    deadline=deadline
+                )
+
+                await store.add_assistant_message(response)
+                await send_response(message.reply, response, message.channel.send, channel_id)
+
+            except QueueFullError as e:
+                logger.warning(f"Menção recusada: {e}")
+                await message.reply(BUSY_MESSAGE)
+            except DeadlineExceeded as e:
+                logger.warning(f"Menção sem resposta dentro do prazo: {e}")
+                await message.reply(TIMEOUT_MESSAGE)
+            except Exception as e:
+                logger.error(f"Erro ao processar menção: {e}")
+                await message.reply("❌ Desculpe, ocorreu um erro ao processar sua mensagem.")
+
     @bot.event
     async def on_message(message):
         if message.author == bot.user:
@@ -65,74 +175,53 @@ def create_bot(config):
         await bot.process_commands(message)
 
         if bot.user.mentioned_in(message) and not message.mention_everyone:
-            store = message_manager.get_store(str(message.channel.id))
-
-            store.add_user_message(
-                str(message.author.id),
-                message.author.display_name,
-                message.content.replace(f'<@{bot.user.id}>', '').strip()
-            )
-
-            async with message.channel.typing():
-                try:
-                    from src.ai.groq import generate_response as groq_generate
-                    from src.ai.openai import generate_response as openai_generate
-
-                    try:
-                        response = await groq_generate(store.get_messages())
-                    except Exception as e:
-                        logger.warning(f"Erro ao usar Groq, tentando OpenAI: {e}")
-                        response = await openai_generate(store.get_messages())
-
-                    store.add_assistant_message(response)
-
-                    if len(response) <= 2000:
-                        await message.reply(response)
-                    else:
-                        for i in range(0, len(response), 2000):
-                            chunk = response[i:i+2000]
-                            if chunk:
-                                if i == 0:
-                                    await message.reply(chunk)
-                                else:
-                                    await message.channel.send(chunk)
-
-                except Exception as e:
-                    logger.error(f"Erro ao processar menção: {e}")
-                    await message.reply("❌ Desculpe, ocorreu um erro ao processar sua mensagem.")
+            MESSAGES_RECEIVED.inc(source="mention")
+            arrival = (message, time.perf_counter(), Deadline(config.request_deadline))
+            channel_queue.submit(str(message.channel.id), arrival, answer_mentions)
 
     @tasks.loop(hours=24)
     async def cleanup_old_data():
         try:
-            removed = message_manager.cleanup_old_stores(max_age_seconds=86400)
+            removed = message_manager.evict()
             if removed > 0:
                 logger.info(f"Limpeza: {removed} armazenamentos de mensagens inativos removidos")
 
             if message_manager.use_persistence:
-                deleted = message_manager.cleanup_db(max_age_seconds=604800)
+                deleted = await message_manager.cleanup_db(max_age_seconds=604800)
                 if deleted > 0:
                     logger.info(f"Limpeza: {deleted} mensagens antigas removidas do banco de dados")
 
+            get_rate_limiter().cleanup()
+
+            expired = await response_cache.cleanup()
+            if expired > 0:
+                logger.info(f"Limpeza: {expired} respostas expiradas removidas do cache")
+
         except Exception as e:
             logger.error(f"Erro durante limpeza periódica: {e}")
 
+    @tasks.loop(minutes=5)
+    async def evict_stores():
+        # A remoção por inatividade e capacidade também roda quando um canal é usado;
+        # este laço libera a memória com o bot parado.
+        try:
+            removed = message_manager.evict()
+            if removed > 0:
+                logger.debug(f"{removed} armazenamentos de mensagens removidos da memória")
+        except Exception as e:
+            logger.error(f"Erro ao remover armazenamentos de mensagens da memória: {e}")
+
     @cleanup_old_data.before_loop
     async def before_cleanup():
         await bot.wait_until_ready()
 
-    cleanup_old_data.start()
-
     @bot.event
     async def on_guild_join(guild):
         logger.info(f"Bot adicionado ao servidor: {guild.name} (ID: {guild.id})")
         logger.info(f"Proprietário: {guild.owner.name if guild.owner else 'Desconhecido'} (ID: {guild.owner.id if guild.owner else 'Desconhecido'})")
         logger.info(f"Membros: {guild.member_count}")
 
-        try:
-            synced = await bot.tree.sync(guild=discord.Object(id=guild.id))
-            logger.info(f"Sincronizados {len(synced)} comandos para o servidor {guild.name}")
-        except Exception as e:
-            logger.error(f"Erro ao sincronizar comandos para o servidor {guild.name}: {e}")
+        await command_sync.sync_guilds(bot, [guild])
 
         target_channel = None
 
@@ -196,13 +285,10 @@ def create_bot(config):
         logger.info(f"Bot removido do servidor: {guild.name} (ID: {guild.id})")
 
         try:
-            channels_cleared = 0
-            for channel_id in list(message_manager.stores.keys()):
-                if str(channel_id).startswith(str(guild.id)):
-                    message_manager.clear_store(channel_id)
-                    channels_cleared += 1
+            channel_ids = [str(channel.id) for channel in guild.channels]
+            removed, deleted = await message_manager.purge_guild(str(guild.id), channel_ids)
 
-            logger.info(f"Limpados {channels_cleared} armazenamentos de mensagens do servidor {guild.name}")
+            logger.info(f"Limpados {removed} armazenamentos de mensagens e {deleted} mensagens salvas do servidor {guild.name}")
         except Exception as e:
             logger.error(f"Erro ao limpar dados do servidor {guild.name}: {e}")
 
@@ -0,0 +1,167 @@
+import os
+import json
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set
+
+import discord
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+GLOBAL_SCOPE = "global"
+
+COMMAND_SYNCS = metrics.counter(
+    "bot_command_syncs_total",
+    "Sincronizações da árvore de comandos slash com o Discord, por escopo e resultado",
+    labelnames=("scope", "result")
+)
+
+def _command_payload(command: Any, tree: discord.app_commands.CommandTree) -> Dict[str, Any]:
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        # Antes do discord.py 2.4, `to_dict` não recebia a árvore.
+        return command.to_dict()
+
+def command_tree_hash(tree: discord.app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """
+    Hash da árvore de comandos (global ou de um servidor) no formato em que ela é
+    enviada ao Discord, independente da ordem de registro dos comandos.
+    """
+    payload = sorted(
+        (_command_payload(command, tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+class CommandSync:
+    """
+    Sincroniza os comandos slash só quando eles mudam.
+
+    O hash da árvore enviada por último em cada escopo fica salvo em `command_sync_state_path`,
+    junto com o ID da aplicação. No modo `auto`, uma árvore com o mesmo hash não é
+    reenviada, então reiniciar ou reconectar o bot não gasta chamadas à API; `always`
+    sincroniza sempre e `never` deixa a sincronização para ser feita por fora. A
+    sincronização por servidor (`command_sync_guilds`) roda em paralelo, no máximo
+    `command_sync_concurrency` servidores por vez, e cada servidor é verificado uma
+    única vez por execução.
+    """
+    def __init__(self, state_path: Optional[str] = None):
+        self.state_path = state_path
+        self._state: Optional[Dict[str, Any]] = None
+        self._checked: Set[int] = set()
+
+    async def sync_global(self, bot: discord.Client) -> bool:
+        """
+        Returns:
+            True se a árvore global foi enviada ao Discord
+        """
+        commands = bot.tree.get_commands()
+        logger.info(f"Comandos registrados na árvore: {', '.join('/' + command.name for command in commands)}")
+
+        synced = await self._sync(bot, None)
+        if synced:
+            self._save()
+        return synced
+
+    async def sync_guilds(self, bot: discord.Client, guilds: Iterable[discord.abc.Snowflake]) -> int:
+        """
+        Returns:
+            Número de servidores cuja árvore foi enviada ao Discord
+        """
+        config = get_config()
+        if not config.command_sync_guilds:
+            return 0
+
+        pending = [guild for guild in guilds if guild.id not in self._checked]
+        if not pending:
+            return 0
+        self._checked.update(guild.id for guild in pending)
+
+        semaphore = asyncio.Semaphore(max(1, config.command_sync_concurrency))
+
+        async def sync(guild: discord.abc.Snowflake) -> bool:
+            async with semaphore:
+                return await self._sync(bot, guild)
+
+        results = await asyncio.gather(*(sync(guild) for guild in pending))
+        synced = sum(results)
+        if synced:
+            self._save()
+
+        logger.info(f"Comandos sincronizados em {synced} de {len(pending)} servidores")
+        return synced
+
+    async def _sync(self, bot: discord.Client, guild: Optional[discord.abc.Snowflake]) -> bool:
+        mode = get_config().command_sync_mode
+        scope = GLOBAL_SCOPE if guild is None else "guild"
+        key = GLOBAL_SCOPE if guild is None else str(guild.id)
+
+        if mode == "never":
+            COMMAND_SYNCS.inc(scope=scope, result="disabled")
+            return False
+
+        hashes = self._hashes(bot.application_id)
+        try:
+            digest: Optional[str] = command_tree_hash(bot.tree, guild)
+        except Exception as e:
+            digest = None
+            logger.warning(f"Erro ao calcular o hash dos comandos do escopo {key}, sincronizando sem comparar: {e}")
+
+        if mode == "auto" and digest is not None and hashes.get(key) == digest:
+            COMMAND_SYNCS.inc(scope=scope, result="unchanged")
+            logger.debug(f"Comandos do escopo {key} inalterados, sincronização ignorada")
+            return False
+
+        try:
+            synced = await bot.tree.sync(guild=guild)
+        except Exception as e:
+            COMMAND_SYNCS.inc(scope=scope, result="error")
+            logger.error(f"Erro ao sincronizar comandos do escopo {key}: {e}")
+            return False
+
+        if digest is None:
+            hashes.pop(key, None)
+        else:
+            hashes[key] = digest
+        COMMAND_SYNCS.inc(scope=scope, result="synced")
+        logger.info(f"Sincronizados {len(synced)} comandos no escopo {key}")
+        return True
+
+    def _path(self) -> Path:
+        return Path(self.state_path or get_config().command_sync_state_path)
+
+    def _hashes(self, application_id: Optional[int]) -> Dict[str, str]:
+        if self._state is None:
+            try:
+                with open(self._path(), "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except FileNotFoundError:
+                self._state = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Estado da sincronização de comandos ilegível, sincronizando tudo: {e}")
+                self._state = {}
+
+        # Outra aplicação (outro token) não tem os comandos registrados por esta.
+        if self._state.get("application_id") != application_id:
+            self._state = {"application_id": application_id, "hashes": {}}
+        return self._state.setdefault("hashes", {})
+
+    def _save(self) -> None:
+        path = self._path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix(path.suffix + ".tmp")
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(temp, path)
+        except OSError as e:
+            logger.error(f"Erro ao salvar o estado da sincronização de comandos: {e}")
+
+command_sync = CommandSync()
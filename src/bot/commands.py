@@ -2,41 +2,32 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
+import time
+from functools import partial
 
 from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
 from src.ai.message_store import MessageStore
 from src.ai.message_manager import message_manager
-from src.ai.groq import generate_response as groq_generate
-from src.ai.openai import generate_response as openai_generate
+from src.ai.router import generate_response, stream_response, get_provider_health
+from src.ai.scheduler import QueueFullError
+from src.ai.deadline import Deadline, DeadlineExceeded
+from src.bot.streaming import StreamingReply
+from src.bot.outbound import send_response
+from src.bot.channel_queue import channel_queue
 from src.ai.personality import get_personality, set_personality
 
 logger = get_logger(__name__)
 
-async def register_commands(bot):
-    try:
-        commands = bot.tree.get_commands()
-        logger.info(f"Comandos registrados na árvore: {len(commands)}")
-        for cmd in commands:
-            logger.info(f"Comando registrado: /{cmd.name}")
-
-        logger.info("Sincronizando comandos slash globalmente...")
-        global_commands = await bot.tree.sync()
-        logger.info(f"Sincronizados {len(global_commands)} comandos globalmente")
-
-        if len(bot.guilds) > 0:
-            logger.info(f"Bot está presente em {len(bot.guilds)} servidores")
-
-            for guild in bot.guilds:
-                try:
-                    logger.info(f"Sincronizando comandos para o servidor {guild.name} (ID: {guild.id})...")
-                    guild_commands = await bot.tree.sync(guild=discord.Object(id=guild.id))
-                    logger.info(f"Sincronizados {len(guild_commands)} comandos para o servidor {guild.name} (ID: {guild.id})")
-                except Exception as e:
-                    logger.error(f"Erro ao sincronizar comandos para o servidor {guild.name} (ID: {guild.id}): {e}")
-        else:
-            logger.warning("Bot não está presente em nenhum servidor ainda")
-    except Exception as e:
-        logger.error(f"Erro ao sincronizar comandos slash: {e}")
+BUSY_MESSAGE = "⏳ Estou recebendo muitos pedidos agora. Tente novamente em alguns instantes."
+TIMEOUT_MESSAGE = "⌛ Desculpe, demorei demais para responder. Tente novamente."
+
+MESSAGES_RECEIVED = metrics.counter(
+    "bot_messages_received_total",
+    "Mensagens que pediram uma resposta da IA, por origem (mention, slash ou command)",
+    labelnames=("source",)
+)
 
 class AIChatCommands(commands.Cog):
     def __init__(self, bot):
@@ -65,25 +56,43 @@ class AIChatCommands(commands.Cog):
     @app_commands.command(name="conversar", description="Conversa com a IA")
     @app_commands.describe(mensagem="O que você quer dizer para a IA")
     async def chat_slash(self, interaction: discord.Interaction, mensagem: str):
+        started_at = time.perf_counter()
+        deadline = Deadline(get_config().request_deadline)
+        MESSAGES_RECEIVED.inc(source="slash")
         await interaction.response.defer(thinking=True)
 
         channel_id = str(interaction.channel_id)
+        guild_id = str(interaction.guild_id) if interaction.guild_id else None
         user_id = str(interaction.user.id)
         username = interaction.user.display_name
 
-        response = await self._process_ai_message(channel_id, user_id, username, mensagem)
+        config = get_config()
+        reply = None
+        if config.stream_responses:
+            reply = StreamingReply(
+                partial(interaction.followup.send, wait=True),
+                edit_interval=config.stream_edit_interval,
+                started_at=started_at,
+                channel_id=channel_id
+            )
+
+        try:
+            response = await self._process_ai_message(channel_id, user_id, username, mensagem, reply, guild_id, deadline)
+        except QueueFullError:
+            await interaction.followup.send(BUSY_MESSAGE)
+            return
+        except DeadlineExceeded:
+            await interaction.followup.send(TIMEOUT_MESSAGE)
+            return
 
         if not response:
             await interaction.followup.send("❌ Desculpe, ocorreu um erro ao gerar a resposta.")
             return
 
-        await interaction.followup.send(response[:2000])
+        if reply is not None:
+            return
 
-        if len(response) > 2000:
-            for i in range(2000, len(response), 2000):
-                chunk = response[i:i+2000]
-                if chunk:
-                    await interaction.followup.send(chunk)
+        await send_response(interaction.followup.send, response, channel_id=channel_id)
 
     @commands.command(name="conversar")
     async def chat_command(self, ctx, *, mensagem: str = None):
@@ -91,48 +100,67 @@ class AIChatCommands(commands.Cog):
             await ctx.send("⚠️ Por favor, forneça uma mensagem para conversar com a IA.")
             return
 
+        deadline = Deadline(get_config().request_deadline)
+        MESSAGES_RECEIVED.inc(source="command")
+
         async with ctx.typing():
             channel_id = str(ctx.channel.id)
+            guild_id = str(ctx.guild.id) if ctx.guild else None
             user_id = str(ctx.author.id)
             username = ctx.author.display_name
 
-            response = await self._process_ai_message(channel_id, user_id, username, mensagem)
+            try:
+                response = await self._process_ai_message(
+                    channel_id, user_id, username, mensagem, guild_id=guild_id, deadline=deadline
+                )
+            except QueueFullError:
+                await ctx.send(BUSY_MESSAGE)
+                return
+            except DeadlineExceeded:
+                await ctx.send(TIMEOUT_MESSAGE)
+                return
 
             if not response:
                 await ctx.send("❌ Desculpe, ocorreu um erro ao gerar a resposta.")
                 return
 
-        if len(response) <= 2000:
-            await ctx.send(response)
-        else:
-            for i in range(0, len(response), 2000):
-                chunk = response[i:i+2000]
-                if chunk:
-                    await ctx.send(chunk)
+        await send_response(ctx.send, response, channel_id=channel_id)
 
-    async def _process_ai_message(self, channel_id, user_id, username, mensagem):
-        store = message_manager.get_store(channel_id)
+    async def _process_ai_message(self, channel_id, user_id, username, mensagem, reply=None, guild_id=None, deadline=None):
+        async with channel_queue.lock(channel_id):
+            if deadline is not None:
+                deadline.check("fila do canal")
 
-        store.add_user_message(user_id, username, mensagem)
+            store = await message_manager.get_store(channel_id, guild_id)
+
+            await store.add_user_message(user_id, username, mensagem)
 
-        try:
-            response = await groq_generate(store.get_messages())
-        except Exception as e:
-            logger.warning(f"Erro ao usar Groq, tentando OpenAI: {e}")
             try:
-                response = await openai_generate(store.get_messages())
-            except Exception as e2:
-                logger.error(f"Erro também na OpenAI: {e2}")
+                if reply is None:
+                    response = await generate_response(
+                        store.get_messages(), channel_id=channel_id, guild_id=guild_id, question=mensagem,
+                        deadline=deadline
+                    )
+                else:
+                    response = await reply.consume(stream_response(
+                        store.get_messages(), channel_id=channel_id, guild_id=guild_id, question=mensagem,
+                        deadline=deadline
+                    ))
+            except (QueueFullError, DeadlineExceeded) as e:
+                logger.warning(f"Pedido recusado: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"Erro ao gerar resposta no canal {channel_id}: {e}")
                 return None
 
-        store.add_assistant_message(response)
-        return response
+            await store.add_assistant_message(response)
+            return response
 
     @app_commands.command(name="limpar", description="Limpa o histórico de conversa")
     async def clear_history_slash(self, interaction: discord.Interaction):
         channel_id = str(interaction.channel_id)
 
-        if message_manager.clear_store(channel_id):
+        if await message_manager.clear_store(channel_id):
             await interaction.response.send_message("🧹 Histórico de conversa deste canal foi limpo!")
         else:
             await interaction.response.send_message("ℹ️ Este canal ainda não tem um histórico de conversa.")
@@ -141,7 +169,7 @@ class AIChatCommands(commands.Cog):
     async def clear_history_command(self, ctx):
         channel_id = str(ctx.channel.id)
 
-        if message_manager.clear_store(channel_id):
+        if await message_manager.clear_store(channel_id):
             await ctx.send("🧹 Histórico de conversa deste canal foi limpo!")
         else:
             await ctx.send("ℹ️ Este canal ainda não tem um histórico de conversa.")
@@ -159,8 +187,7 @@ class AIChatCommands(commands.Cog):
 
         set_personality(nova_personalidade)
 
-        for channel_id in list(message_manager.stores.keys()):
-            message_manager.clear_store(channel_id)
+        await message_manager.clear_all()
 
         await ctx.send("✅ Personalidade do bot atualizada com sucesso!")
 
@@ -178,8 +205,7 @@ class AIChatCommands(commands.Cog):
 
         set_personality(nova_personalidade)
 
-        for channel_id in list(message_manager.stores.keys()):
-            message_manager.clear_store(channel_id)
+        await message_manager.clear_all()
 
         await interaction.response.send_message("✅ Personalidade do bot atualizada com sucesso!")
 
@@ -220,14 +246,24 @@ class AIChatCommands(commands.Cog):
                 inline=False
             )
 
-        await ctx.send(embed=embed)
+        state_names = {"closed": "🟢 fechado", "open": "🔴 aberto", "half_open": "🟡 meio-aberto"}
+        provider_lines = []
+        for health in get_provider_health():
+            p95 = f"{health['p95_latency']:.2f}s" if health["p95_latency"] is not None else "-"
+            provider_lines.append(
+                f"{health['name']}: {state_names.get(health['state'], health['state'])} | "
+                f"{health['requests']} chamadas | erros {health['error_rate']:.0%} | p95 {p95}"
+            )
+        embed.add_field(
+            name="Provedores de IA",
+            value="\n".join(provider_lines),
+            inline=False
+        )
 
-def setup(bot):
-    cog = AIChatCommands(bot)
-    bot.add_cog(cog)
+        await ctx.send(embed=embed)
 
-    bot.tree.add_command(cog.chat_slash)
-    bot.tree.add_command(cog.clear_history_slash)
-    bot.tree.add_command(cog.personality_slash)
+async def setup(bot):
+    # add_cog também registra na árvore os comandos slash definidos no cog.
+    await bot.add_cog(AIChatCommands(bot))
 
     logger.info(f"Comandos de chat com IA registrados! Comandos slash: {len(bot.tree.get_commands())}")
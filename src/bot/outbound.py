@@ -0,0 +1,185 @@
+import io
+import re
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+DISCORD_MESSAGE_LIMIT = 2000
+ATTACHMENT_FILENAME = "resposta.md"
+ATTACHMENT_NOTE = "📎 A resposta ficou longa demais para o chat, então segue em anexo."
+
+# Separadores em ordem de preferência: o texto antes de cada um termina no índice
+# indicado, e o próximo trecho começa logo depois do separador.
+_SEPARATORS = (("\n\n", 0), ("\n", 0), (". ", 1), ("! ", 1), ("? ", 1), ("; ", 1), (" ", 0))
+_FENCE = re.compile(r"^\s*```(\S*)", re.MULTILINE)
+FENCE_CLOSE = "\n```"
+
+OUTBOUND_MESSAGES = metrics.counter(
+    "bot_outbound_messages_total",
+    "Mensagens enviadas ao Discord pelo pipeline de saída, por tipo",
+    labelnames=("kind",)
+)
+OUTBOUND_THROTTLE = metrics.histogram(
+    "bot_outbound_throttle_seconds",
+    "Espera imposta pelo limite de mensagens por canal antes de um envio"
+)
+DISCORD_SEND = metrics.histogram(
+    "bot_discord_send_seconds",
+    "Duração de cada envio ou edição de mensagem na API do Discord",
+    labelnames=("kind",)
+)
+
+def split_point(text: str, limit: int) -> Tuple[int, int]:
+    """
+    Onde cortar `text` para que o primeiro trecho caiba em `limit` caracteres,
+    preferindo fim de parágrafo, depois de linha, de frase e de palavra.
+
+    Returns:
+        Fim do primeiro trecho e início do restante
+    """
+    if len(text) <= limit:
+        return len(text), len(text)
+
+    for separator, keep in _SEPARATORS:
+        index = text.rfind(separator, 0, limit)
+        if index >= limit // 2:
+            return index + keep, index + len(separator)
+
+    return limit, limit
+
+def open_fence(text: str) -> Optional[str]:
+    """
+    Linguagem do bloco de código que continua aberto no fim de `text`, ou None.
+    """
+    language = None
+    for match in _FENCE.finditer(text):
+        language = match.group(1) if language is None else None
+    return language
+
+def next_chunk(text: str, language: Optional[str] = None,
+               limit: int = DISCORD_MESSAGE_LIMIT) -> Tuple[str, int, Optional[str]]:
+    """
+    Próxima mensagem de até `limit` caracteres de `text`. `language` é a linguagem do
+    bloco de código deixado aberto pela mensagem anterior, reaberto no começo desta; um
+    bloco que continua aberto no corte é fechado no fim.
+
+    Returns:
+        A mensagem, onde o restante de `text` começa e a linguagem do bloco que segue
+        aberto (None se nenhum)
+    """
+    prefix = f"```{language}\n" if language is not None else ""
+    if len(prefix) + len(text) <= limit:
+        return prefix + text, len(text), None
+
+    end, resume = split_point(text, limit - len(prefix) - len(FENCE_CLOSE))
+    chunk = prefix + text[:end]
+    language = open_fence(chunk)
+    if language is not None:
+        chunk += FENCE_CLOSE
+    return chunk, resume, language
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """
+    Divide uma resposta em mensagens de até `limit` caracteres sem quebrar palavras,
+    frases ou parágrafos quando possível. Um bloco de código cortado ao meio é fechado
+    no fim de um trecho e reaberto, com a mesma linguagem, no começo do seguinte.
+    """
+    chunks = []
+    language = None
+
+    while text:
+        chunk, resume, language = next_chunk(text, language, limit)
+        text = text[resume:]
+        if chunk.strip():
+            chunks.append(chunk)
+
+    return chunks
+
+def attachment(text: str) -> discord.File:
+    return discord.File(io.BytesIO(text.encode("utf-8")), filename=ATTACHMENT_FILENAME)
+
+class ChannelRateLimiter:
+    """
+    Limite proativo de mensagens por canal: no máximo `messages` envios a cada
+    `per_seconds` segundos, como o Discord aplica, para esperar aqui em vez de
+    receber um 429.
+    """
+    def __init__(self, messages: int = 5, per_seconds: float = 5.0):
+        self.messages = messages
+        self.per_seconds = per_seconds
+        self._sent: Dict[str, Deque[float]] = {}
+
+    async def wait(self, channel_id: Optional[str]) -> None:
+        if channel_id is None or self.messages <= 0:
+            return
+
+        sent = self._sent.setdefault(channel_id, deque())
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            while sent and now - sent[0] >= self.per_seconds:
+                sent.popleft()
+
+            if len(sent) < self.messages:
+                sent.append(now)
+                break
+
+            delay = self.per_seconds - (now - sent[0])
+            waited += delay
+            await asyncio.sleep(delay)
+
+        if waited:
+            OUTBOUND_THROTTLE.observe(waited)
+
+    def cleanup(self) -> int:
+        now = time.monotonic()
+        idle = [channel_id for channel_id, sent in self._sent.items()
+                if not sent or now - sent[-1] >= self.per_seconds]
+        for channel_id in idle:
+            del self._sent[channel_id]
+        return len(idle)
+
+_limiter: Optional[ChannelRateLimiter] = None
+
+def get_rate_limiter() -> ChannelRateLimiter:
+    global _limiter
+
+    if _limiter is None:
+        config = get_config()
+        _limiter = ChannelRateLimiter(config.outbound_channel_messages, config.outbound_channel_window)
+    return _limiter
+
+async def send_response(send: Callable[..., Awaitable[Any]], text: str,
+                        send_more: Optional[Callable[..., Awaitable[Any]]] = None,
+                        channel_id: Optional[str] = None) -> None:
+    """
+    Envia uma resposta pelo pipeline de saída. O primeiro trecho vai por `send` (uma
+    resposta à mensagem, por exemplo) e os demais por `send_more`. Respostas acima de
+    `outbound_attachment_threshold` caracteres viram um único envio com arquivo anexo.
+    """
+    config = get_config()
+    send_more = send_more or send
+    limiter = get_rate_limiter()
+
+    threshold = config.outbound_attachment_threshold
+    if threshold and len(text) > threshold:
+        await limiter.wait(channel_id)
+        with DISCORD_SEND.time(kind="attachment"):
+            await send(ATTACHMENT_NOTE, file=attachment(text))
+        OUTBOUND_MESSAGES.inc(kind="attachment")
+        return
+
+    for index, chunk in enumerate(split_message(text)):
+        await limiter.wait(channel_id)
+        with DISCORD_SEND.time(kind="text"):
+            await (send if index == 0 else send_more)(chunk)
+        OUTBOUND_MESSAGES.inc(kind="text")
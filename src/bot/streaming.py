@@ -0,0 +1,120 @@
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import discord
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+from src.bot.outbound import (
+    ATTACHMENT_NOTE, DISCORD_MESSAGE_LIMIT, DISCORD_SEND, FENCE_CLOSE, OUTBOUND_MESSAGES,
+    attachment, get_rate_limiter, next_chunk, open_fence
+)
+
+logger = get_logger(__name__)
+
+FIRST_TOKEN_SECONDS = metrics.histogram(
+    "bot_first_visible_token_seconds",
+    "Tempo entre a chegada do pedido e o primeiro trecho da resposta visível no Discord"
+)
+
+class StreamingReply:
+    """
+    Publica uma resposta em streaming no Discord, pelo mesmo pipeline de saída de
+    `send_response`.
+
+    A primeira parte é enviada assim que chega e a mensagem é editada no máximo a cada
+    `edit_interval` segundos, para respeitar o limite de edições do Discord. Quando o
+    texto passa de 2000 caracteres, a mensagem atual é finalizada e o restante continua
+    em uma nova mensagem, reabrindo o bloco de código que tiver ficado aberto. Cada
+    mensagem nova espera a vez no limite por canal, e uma resposta que passa de
+    `outbound_attachment_threshold` caracteres para de ser atualizada e segue completa
+    em anexo no final.
+    """
+    def __init__(self, send: Callable[..., Awaitable[discord.Message]],
+                 send_more: Optional[Callable[..., Awaitable[discord.Message]]] = None,
+                 edit_interval: float = 1.0, started_at: Optional[float] = None,
+                 channel_id: Optional[str] = None):
+        self.send = send
+        self.send_more = send_more or send
+        self.edit_interval = edit_interval
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.channel_id = channel_id
+        self.attachment_threshold = get_config().outbound_attachment_threshold
+
+        self.text = ""
+        self._offset = 0
+        self._language: Optional[str] = None
+        self._message: Optional[discord.Message] = None
+        self._rendered = ""
+        self._last_render = 0.0
+        self._sent_any = False
+        self._overflow = False
+
+    async def consume(self, chunks: AsyncIterator[str]) -> str:
+        async for chunk in chunks:
+            self.text += chunk
+            if self.attachment_threshold and len(self.text) > self.attachment_threshold:
+                self._overflow = True
+            if not self._overflow and time.perf_counter() - self._last_render >= self.edit_interval:
+                await self._render()
+
+        if self._overflow:
+            await self._send_attachment()
+        else:
+            await self._render()
+        return self.text
+
+    async def _render(self) -> None:
+        self._last_render = time.perf_counter()
+        segment = self.text[self._offset:]
+
+        while True:
+            # Sobra espaço para fechar na exibição um bloco de código ainda incompleto.
+            content, resume, language = next_chunk(
+                segment, self._language, DISCORD_MESSAGE_LIMIT - len(FENCE_CLOSE)
+            )
+            if resume >= len(segment):
+                break
+
+            await self._show(content)
+            self._message = None
+            self._rendered = ""
+            self._offset += resume
+            self._language = language
+            segment = self.text[self._offset:]
+
+        await self._show(content)
+
+    async def _show(self, content: str) -> None:
+        if not content.strip() or content == self._rendered:
+            return
+
+        # Enquanto o bloco de código ainda está chegando, ele aparece fechado.
+        shown = content + FENCE_CLOSE if open_fence(content) is not None else content
+
+        if self._message is None:
+            self._message = await self._send_new(shown, kind="stream")
+        else:
+            with DISCORD_SEND.time(kind="edit"):
+                await self._message.edit(content=shown)
+
+        self._rendered = content
+
+    async def _send_attachment(self) -> None:
+        await self._send_new(ATTACHMENT_NOTE, kind="attachment", file=attachment(self.text))
+
+    async def _send_new(self, content: str, kind: str, **kwargs: Any) -> discord.Message:
+        await get_rate_limiter().wait(self.channel_id)
+
+        sender = self.send_more if self._sent_any else self.send
+        with DISCORD_SEND.time(kind=kind):
+            message = await sender(content, **kwargs)
+        OUTBOUND_MESSAGES.inc(kind=kind)
+
+        if not self._sent_any:
+            self._sent_any = True
+            elapsed = time.perf_counter() - self.started_at
+            FIRST_TOKEN_SECONDS.observe(elapsed)
+            logger.debug(f"Primeiro trecho da resposta visível após {elapsed * 1000:.0f} ms")
+        return message
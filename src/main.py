@@ -1,12 +1,20 @@
+from src.utils.startup import startup_profile
+
 import os
 import asyncio
 from dotenv import load_dotenv
 
 from src.bot.client import create_bot
-from src.utils.logger import setup_logger
+from src.utils.logger import setup_logger, get_logger
 from src.utils.config import load_config
+from src.ai.message_manager import message_manager
+from src.ai.clients import provider_clients
+from src.ai.response_cache import response_cache
+from src.utils.metrics_server import metrics_server
+
+startup_profile.mark("importações")
 
-logger = setup_logger()
+logger = get_logger(__name__)
 
 async def main():
     try:
@@ -21,18 +29,35 @@ async def main():
             return
 
         config = load_config()
+        startup_profile.mark("configuração")
+
+        await metrics_server.start()
+
+        await message_manager.hydrate()
+        await response_cache.load(message_manager.persistence)
+        startup_profile.mark("histórico e cache")
 
         bot = create_bot(config)
 
         token = os.getenv("DISCORD_TOKEN")
         logger.info("Iniciando o bot...")
-        await bot.start(token)
+        try:
+            await bot.start(token)
+        finally:
+            if not bot.is_closed():
+                await bot.close()
+            await provider_clients.close()
+            await metrics_server.close()
+            message_manager.close()
 
     except Exception as e:
         logger.exception(f"Erro ao iniciar o bot: {e}")
         raise
 
 if __name__ == "__main__":
+    setup_logger()
+    startup_profile.mark("logging")
+
     try:
         logger.info("Iniciando aplicação...")
         asyncio.run(main())
@@ -1,4 +1,17 @@
-from src.utils.logger import get_logger, setup_logger
-from src.utils.config import load_config, get_config
+import importlib
+
+# Reexportações carregadas sob demanda: importar um submódulo leve (src.utils.startup,
+# src.utils.metrics) não deve carregar loguru, pydantic e yaml junto.
+_EXPORTS = {
+    "get_logger": "src.utils.logger",
+    "setup_logger": "src.utils.logger",
+    "load_config": "src.utils.config",
+    "get_config": "src.utils.config",
+}
 
 __all__ = ["get_logger", "setup_logger", "load_config", "get_config"]
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
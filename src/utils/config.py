@@ -2,7 +2,7 @@ import os
 import json
 import yaml
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Literal
 
 from pydantic import BaseModel, Field
 from src.utils.logger import get_logger
@@ -20,13 +20,96 @@ class BotConfig(BaseModel):
     ai_model: str = Field(default="llama-3.1-8b-instant", description="Modelo de IA padrão para o Groq")
     openai_model: str = Field(default="gpt-4o-mini-2024-07-18", description="Modelo de IA padrão para o OpenAI (fallback)")
     max_context_messages: int = Field(default=50, description="Número máximo de mensagens para manter no contexto")
+    context_token_budget: int = Field(default=6000, description="Número máximo de tokens por pedido (histórico + prompt de sistema + resposta)")
+    model_token_budgets: Dict[str, int] = Field(default_factory=dict, description="Orçamento de tokens por modelo, sobrepõe context_token_budget")
+    summary_enabled: bool = Field(default=True, description="Resume em segundo plano as mensagens mais antigas quando o histórico de um canal fica grande")
+    summary_model: str = Field(default="llama-3.1-8b-instant", description="Modelo da Groq usado para resumir o histórico")
+    summary_trigger_tokens: int = Field(default=3000, description="Tamanho do histórico (em tokens) a partir do qual as mensagens antigas são resumidas")
+    summary_keep_messages: int = Field(default=10, description="Número de mensagens recentes que nunca entram no resumo")
+    summary_max_words: int = Field(default=200, description="Tamanho máximo pedido para o resumo, em palavras")
+    summary_max_tokens: int = Field(default=400, description="Número máximo de tokens na resposta do modelo de resumo")
+    summary_timeout: float = Field(default=60.0, description="Prazo (em segundos) para gerar um resumo, incluindo a fila e as tentativas")
 
     log_level: str = Field(default="INFO", description="Nível de logging")
-
-    response_timeout: int = Field(default=30, description="Tempo máximo (em segundos) para aguardar resposta da IA")
+    log_diagnose: bool = Field(default=False, description="Mostra os valores das variáveis nos tracebacks do log (lento e pode expor dados sensíveis)")
+    log_queue_size: int = Field(default=10000, description="Máximo de registros esperando gravação em cada sink de log")
+    log_batch_size: int = Field(default=512, description="Máximo de registros gravados de uma vez por um sink de log")
+    log_block_timeout: float = Field(default=0.05, description="Tempo máximo (em segundos) que um aviso ou erro espera por espaço na fila de log cheia; registros de nível menor são descartados na hora")
+    log_max_bytes: int = Field(default=10485760, description="Tamanho máximo (em bytes) de um arquivo de log antes da rotação; os arquivos também giram a cada dia")
+    log_retention: int = Field(default=5, description="Número de arquivos de log antigos mantidos por formato")
+
+    metrics_enabled: bool = Field(default=False, description="Expõe as métricas no formato do Prometheus em http://metrics_host:metrics_port/metrics")
+    metrics_host: str = Field(default="127.0.0.1", description="Endereço em que o endpoint de métricas escuta")
+    metrics_port: int = Field(default=9464, description="Porta do endpoint de métricas")
+
+    response_timeout: int = Field(default=30, description="Tempo máximo (em segundos) para aguardar cada chamada à IA")
+    request_deadline: float = Field(default=45.0, description="Prazo total (em segundos) de um pedido, da chegada da menção ou do comando até a resposta, somando fila, tentativas e fallback")
     max_tokens: int = Field(default=1024, description="Número máximo de tokens para geração de resposta")
     temperature: float = Field(default=0.7, description="Temperatura para geração de texto (0.0-1.0)")
 
+    http_max_connections: int = Field(default=20, description="Número máximo de conexões HTTP simultâneas por provedor de IA")
+    http_max_keepalive_connections: int = Field(default=10, description="Número máximo de conexões HTTP ociosas mantidas abertas por provedor de IA")
+    http_keepalive_expiry: float = Field(default=60.0, description="Tempo (em segundos) que uma conexão HTTP ociosa é mantida aberta")
+    prewarm_connections: bool = Field(default=True, description="Abre as conexões com os provedores de IA ao iniciar o bot")
+
+    command_sync_mode: Literal["auto", "always", "never"] = Field(default="auto", description="Quando sincronizar os comandos slash: auto (só quando a árvore muda), always (a cada início) ou never")
+    command_sync_guilds: bool = Field(default=False, description="Também sincroniza a árvore de comandos de cada servidor")
+    command_sync_concurrency: int = Field(default=5, description="Número máximo de servidores sincronizados ao mesmo tempo")
+    command_sync_state_path: str = Field(default="data/command_sync.json", description="Arquivo com o hash da última árvore de comandos sincronizada")
+
+    stream_responses: bool = Field(default=False, description="Publica a resposta enquanto ela é gerada, editando a mensagem no Discord")
+    stream_edit_interval: float = Field(default=1.0, description="Intervalo mínimo (em segundos) entre edições de uma resposta em streaming")
+    mention_batch_size: int = Field(default=10, description="Máximo de menções do mesmo canal respondidas juntas em uma única geração")
+    outbound_attachment_threshold: int = Field(default=6000, description="Respostas com mais caracteres que isso são enviadas como arquivo anexo (0 = nunca)")
+    outbound_channel_messages: int = Field(default=5, description="Máximo de mensagens enviadas por canal dentro de outbound_channel_window (0 = sem limite)")
+    outbound_channel_window: float = Field(default=5.0, description="Janela (em segundos) do limite de mensagens enviadas por canal")
+
+    hedge_requests: bool = Field(default=True, description="Dispara a OpenAI em paralelo quando a Groq demora mais que o atraso de hedge")
+    hedge_delay: float = Field(default=3.0, description="Atraso de hedge (em segundos) usado enquanto não há latências suficientes da Groq")
+    hedge_quantile: float = Field(default=0.95, description="Quantil das latências recentes da Groq usado como atraso de hedge")
+    hedge_min_delay: float = Field(default=0.5, description="Menor atraso de hedge permitido (em segundos)")
+    hedge_max_delay: float = Field(default=10.0, description="Maior atraso de hedge permitido (em segundos)")
+    hedge_min_samples: int = Field(default=20, description="Número mínimo de latências observadas antes de adaptar o atraso de hedge")
+
+    breaker_window_seconds: float = Field(default=60.0, description="Janela (em segundos) usada pelo disjuntor para calcular a taxa de falhas de cada provedor")
+    breaker_min_requests: int = Field(default=5, description="Número mínimo de chamadas na janela antes de o disjuntor poder abrir")
+    breaker_error_threshold: float = Field(default=0.5, description="Fração de falhas na janela que abre o circuito de um provedor (0.0-1.0)")
+    breaker_slow_call_seconds: float = Field(default=15.0, description="Chamadas mais lentas que isso (em segundos) contam como falha para o disjuntor")
+    breaker_open_seconds: float = Field(default=30.0, description="Tempo (em segundos) que o circuito fica aberto antes de liberar chamadas de teste")
+    breaker_half_open_probes: int = Field(default=1, description="Número de chamadas de teste simultâneas com o circuito meio-aberto")
+
+    retry_max_attempts: int = Field(default=3, description="Número máximo de tentativas de uma chamada a um provedor antes de recorrer ao outro")
+    retry_base_delay: float = Field(default=0.5, description="Espera mínima (em segundos) antes de repetir uma chamada que falhou")
+    retry_max_delay: float = Field(default=8.0, description="Espera máxima (em segundos) entre tentativas, salvo quando o provedor pede mais com Retry-After")
+    retry_deadline: float = Field(default=45.0, description="Tempo total (em segundos) que as tentativas em um provedor podem levar")
+
+    groq_requests_per_minute: int = Field(default=30, description="Limite de pedidos por minuto enviados à Groq (0 = sem limite)")
+    groq_tokens_per_minute: int = Field(default=0, description="Limite de tokens por minuto enviados à Groq, contando prompt e max_tokens (0 = sem limite)")
+    openai_requests_per_minute: int = Field(default=0, description="Limite de pedidos por minuto enviados à OpenAI (0 = sem limite)")
+    openai_tokens_per_minute: int = Field(default=0, description="Limite de tokens por minuto enviados à OpenAI, contando prompt e max_tokens (0 = sem limite)")
+    scheduler_max_queue_depth: int = Field(default=100, description="Máximo de pedidos esperando na fila de cada provedor antes de recusar novos")
+    scheduler_guild_weights: Dict[str, int] = Field(default_factory=dict, description="Peso de cada servidor (ID) na divisão da cota dos provedores; o padrão é 1")
+
+    response_cache_enabled: bool = Field(default=True, description="Reutiliza respostas para prompts idênticos")
+    response_cache_max_entries: int = Field(default=1000, description="Número máximo de respostas mantidas no cache em memória")
+    response_cache_ttl: int = Field(default=3600, description="Tempo (em segundos) que uma resposta em cache continua válida")
+    response_cache_persist: bool = Field(default=True, description="Também grava o cache de respostas no banco de dados SQLite")
+    response_cache_max_temperature: float = Field(default=0.3, description="Acima desta temperatura o cache de respostas fica desligado")
+    response_cache_allow_high_temperature: bool = Field(default=False, description="Mantém o cache de respostas ligado mesmo acima de response_cache_max_temperature")
+
+    similarity_cache_enabled: bool = Field(default=False, description="Reaproveita a resposta de uma pergunta muito parecida feita antes no mesmo canal ou servidor")
+    similarity_cache_scope: Literal["channel", "guild"] = Field(default="channel", description="Onde perguntas parecidas podem compartilhar resposta: channel ou guild")
+    similarity_threshold: float = Field(default=0.8, description="Similaridade mínima (Jaccard estimada, 0.0-1.0) para reaproveitar uma resposta")
+    similarity_cache_max_entries: int = Field(default=10000, description="Número máximo de perguntas guardadas no índice de similaridade")
+
+    db_batch_size: int = Field(default=32, description="Número de mensagens acumuladas antes de gravar um lote no banco de dados")
+    db_flush_interval: float = Field(default=2.0, description="Tempo máximo (em segundos) que uma mensagem pode aguardar no buffer antes de ser gravada")
+    db_synchronous: Literal["OFF", "NORMAL", "FULL"] = Field(default="NORMAL", description="Modo PRAGMA synchronous do SQLite (OFF, NORMAL, FULL)")
+    history_hydration: Literal["eager", "lazy", "never"] = Field(default="lazy", description="Como restaurar o histórico salvo: eager (tudo no início), lazy (na primeira menção) ou never (só o que foi dito desde que o bot iniciou)")
+    hydration_max_age: int = Field(default=86400, description="Idade máxima (em segundos) da última mensagem de um canal para ser pré-carregado no modo eager")
+    store_max_resident: int = Field(default=5000, description="Máximo de canais com histórico mantido em memória; os menos usados são descarregados (0 = sem limite)")
+    store_idle_seconds: float = Field(default=3600.0, description="Tempo (em segundos) sem uso depois do qual o histórico de um canal sai da memória")
+
 _config: Optional[BotConfig] = None
 
 def load_config(config_path: Optional[str] = None) -> BotConfig:
@@ -1,40 +1,259 @@
 import os
 import sys
+import abc
 import json
+import queue
+import atexit
 import logging
+import zipfile
 import datetime
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, BinaryIO, Callable, List, Optional, TextIO, Tuple
 
 from loguru import logger
 
+from src.utils import metrics
+
 LOG_DIR = Path("logs")
 DEFAULT_LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
 _config = None
 
-class JsonSink:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-    def write(self, message):
-        record = message.record
-        log_entry = {
-            "timestamp": record["time"].strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
-            "level": record["level"].name,
-            "module": record["name"],
-            "function": record["function"],
-            "line": record["line"],
-            "message": record["message"],
-            "process_id": record["process"].id,
-            "thread_id": record["thread"].id
-        }
-
-        if record["extra"]:
-            log_entry["extra"] = record["extra"]
-
-        with open(self.file_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
+WARNING_LEVEL = 30
+_STOP = object()
+
+DROPPED_RECORDS = metrics.counter(
+    "log_records_dropped_total",
+    "Registros de log descartados porque a fila do sink estava cheia",
+    labelnames=("sink",)
+)
+
+def _render_text(message: Any) -> str:
+    return str(message)
+
+def _render_json(message: Any) -> str:
+    record = message.record
+    log_entry = {
+        "timestamp": record["time"].strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "level": record["level"].name,
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+        "process_id": record["process"].id,
+        "thread_id": record["thread"].id
+    }
+
+    if record["extra"]:
+        log_entry["extra"] = record["extra"]
+
+    return json.dumps(log_entry, default=str) + "\n"
+
+def _record_date(message: Any) -> str:
+    return message.record["time"].strftime("%Y-%m-%d")
+
+def _text_notice(count: int) -> str:
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return f"{now} | WARNING  | {__name__} - {count} registros de log descartados com a fila cheia\n"
+
+def _json_notice(count: int) -> str:
+    return json.dumps({
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "level": "WARNING",
+        "module": __name__,
+        "message": f"{count} registros de log descartados com a fila cheia",
+        "dropped": count
+    }) + "\n"
+
+class BufferedSink(abc.ABC):
+    """
+    Sink do loguru que escreve a partir de uma thread dedicada.
+
+    `write` só coloca a mensagem em uma fila limitada a `queue_size`; a thread a
+    renderiza e grava em lotes de até `batch_size` mensagens, com um único write por lote.
+    Com a fila cheia, registros abaixo de WARNING são descartados na hora e os demais
+    esperam até `block_timeout` segundos por espaço antes de serem descartados; a
+    quantidade descartada é registrada no próprio log assim que a fila esvazia.
+
+    As subclasses implementam `_emit`, que grava um lote de pares (data, linha).
+    """
+    def __init__(self, name: str, render: Callable[[Any], str] = _render_text,
+                 notice: Callable[[int], str] = _text_notice, queue_size: int = 10000,
+                 batch_size: int = 512, block_timeout: float = 0.05):
+        self.name = name
+        self.render = render
+        self.notice = notice
+        self.batch_size = max(1, batch_size)
+        self.block_timeout = block_timeout
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stopped = False
+
+        self._writer = threading.Thread(target=self._run, name=f"log-writer-{name}", daemon=True)
+        self._writer.start()
+        atexit.register(self.stop)
+
+    def write(self, message: Any) -> None:
+        try:
+            self._queue.put_nowait(message)
+            return
+        except queue.Full:
+            pass
+
+        if message.record["level"].no >= WARNING_LEVEL and self.block_timeout > 0:
+            try:
+                self._queue.put(message, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+
+        with self._dropped_lock:
+            self._dropped += 1
+        DROPPED_RECORDS.inc(sink=self.name)
+
+    def stop(self) -> None:
+        """
+        Grava o que ainda está na fila e encerra a thread. Chamado pelo loguru em
+        `logger.remove()` e no encerramento do processo.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+
+        self._queue.put(_STOP)
+        self._writer.join(timeout=5)
+        self._close()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is _STOP
+            lines = [(_record_date(message), self.render(message)) for message in batch if message is not _STOP]
+
+            with self._dropped_lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                lines.append((datetime.date.today().isoformat(), self.notice(dropped)))
+
+            try:
+                self._emit(lines)
+            except Exception as e:
+                sys.stderr.write(f"Erro ao gravar o log {self.name}: {e}\n")
+
+            if stop:
+                return
+
+    @abc.abstractmethod
+    def _emit(self, lines: List[Tuple[str, str]]) -> None:
+        ...
+
+    def _close(self) -> None:
+        pass
+
+class BufferedStreamSink(BufferedSink):
+    def __init__(self, stream: TextIO, **kwargs: Any):
+        self.stream = stream
+        super().__init__("stdout", **kwargs)
+
+    def _emit(self, lines: List[Tuple[str, str]]) -> None:
+        if lines:
+            self.stream.write("".join(line for _, line in lines))
+            self.stream.flush()
+
+class RotatingFileSink(BufferedSink):
+    """
+    Grava em `<diretório>/<prefixo>_<data><sufixo>` com o arquivo aberto o tempo todo.
+    Troca de arquivo quando o dia muda e, dentro do mesmo dia, quando o arquivo passa de
+    `max_bytes` (o anterior vira `<prefixo>_<data>.<n><sufixo>`, compactado em zip se
+    `compress`). Só os `retention` arquivos antigos mais recentes são mantidos.
+    """
+    def __init__(self, directory: Path, prefix: str, suffix: str, max_bytes: int = 10 * 1024 * 1024,
+                 retention: int = 5, compress: bool = False, **kwargs: Any):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.retention = retention
+        self.compress = compress
+
+        self._file: Optional[BinaryIO] = None
+        self._date: Optional[str] = None
+        self._size = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(suffix.lstrip("."), **kwargs)
+
+    def _path(self, date: str) -> Path:
+        return self.directory / f"{self.prefix}_{date}{self.suffix}"
+
+    def _emit(self, lines: List[Tuple[str, str]]) -> None:
+        buffer = bytearray()
+        for date, line in lines:
+            data = line.encode("utf-8")
+            if date != self._date or (self.max_bytes and self._size + len(buffer) + len(data) > self.max_bytes):
+                self._write(buffer)
+                buffer = bytearray()
+                self._rotate(date)
+            buffer += data
+        self._write(buffer)
+
+    def _write(self, data: bytes) -> None:
+        if data and self._file is not None:
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+
+    def _rotate(self, date: str) -> None:
+        rollover = date == self._date and self._file is not None
+        self._close()
+
+        path = self._path(date)
+        if rollover or (self.max_bytes and path.exists() and path.stat().st_size >= self.max_bytes):
+            self._archive(path, date)
+
+        self._file = open(path, "ab")
+        self._date = date
+        self._size = self._file.tell()
+        self._apply_retention()
+
+    def _archive(self, path: Path, date: str) -> None:
+        index = 1
+        while any(self.directory.glob(f"{self.prefix}_{date}.{index}{self.suffix}*")):
+            index += 1
+
+        archived = self.directory / f"{self.prefix}_{date}.{index}{self.suffix}"
+        os.replace(path, archived)
+
+        if self.compress:
+            with zipfile.ZipFile(f"{archived}.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.write(archived, archived.name)
+            archived.unlink()
+
+    def _apply_retention(self) -> None:
+        if self.retention <= 0:
+            return
+
+        active = self._path(self._date)
+        old = [path for path in self.directory.glob(f"{self.prefix}_*{self.suffix}*") if path != active]
+        old.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in old[self.retention:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 def _get_config():
     global _config
@@ -46,46 +265,56 @@ def _get_config():
         except ImportError:
             class DefaultConfig:
                 log_level = "INFO"
+                log_diagnose = False
+                log_queue_size = 10000
+                log_batch_size = 512
+                log_block_timeout = 0.05
+                log_max_bytes = 10 * 1024 * 1024
+                log_retention = 5
             _config = DefaultConfig()
 
     return _config
 
 def setup_logger():
-    LOG_DIR.mkdir(exist_ok=True)
-
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-    log_file = LOG_DIR / f"bot_{today}.log"
-    json_log_file = LOG_DIR / f"bot_{today}.json"
-
     config = _get_config()
     log_level = os.getenv("LOG_LEVEL", config.log_level)
+    buffering = {
+        "queue_size": config.log_queue_size,
+        "batch_size": config.log_batch_size,
+        "block_timeout": config.log_block_timeout
+    }
+    rotation = {"max_bytes": config.log_max_bytes, "retention": config.log_retention}
 
+    # Para também as threads dos sinks de uma configuração anterior.
     logger.remove()
 
     logger.add(
-        sys.stdout,
+        BufferedStreamSink(sys.stdout, **buffering),
         format=DEFAULT_LOG_FORMAT,
         level=log_level,
         colorize=True,
         backtrace=True,
-        diagnose=True
+        diagnose=config.log_diagnose
     )
 
     logger.add(
-        log_file,
+        RotatingFileSink(LOG_DIR, "bot", ".log", compress=True, **rotation, **buffering),
         format=DEFAULT_LOG_FORMAT,
         level=log_level,
-        rotation="10 MB",
-        retention=5,
-        compression="zip",
+        colorize=False,
         backtrace=True,
-        diagnose=True
+        diagnose=config.log_diagnose
     )
 
+    # O JSON é montado a partir do registro na thread do sink; o formato mínimo evita
+    # formatar o texto à toa na thread que chamou o log.
     logger.add(
-        JsonSink(str(json_log_file)),
+        RotatingFileSink(LOG_DIR, "bot", ".json", render=_render_json, notice=_json_notice,
+                         **rotation, **buffering),
+        format="{message}",
         level=log_level,
-        serialize=True
+        backtrace=False,
+        diagnose=False
     )
 
     setup_standard_logging()
@@ -0,0 +1,165 @@
+import math
+import time
+from typing import Callable, Dict, List, Tuple, Sequence, Optional
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self) -> None:
+        self.values = {}
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._key(labels), 0)
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """
+    Histograma com baldes fixos: cada observação custa uma busca linear curta e
+    três incrementos, sem alocação.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start: Optional[float] = None
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+_registry: Dict[str, Metric] = {}
+
+def _register(cls, name: str, description: str, **kwargs) -> Metric:
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = cls(name, description, **kwargs)
+    return metric
+
+def counter(name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, description, labelnames=labelnames)
+
+def gauge(name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge, name, description, labelnames=labelnames)
+
+def histogram(name: str, description: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, description, labelnames=labelnames, buckets=buckets)
+
+def get_metrics() -> Dict[str, Metric]:
+    return dict(_registry)
+
+_collectors: List[Callable[[], None]] = []
+
+def register_collector(collect: Callable[[], None]) -> None:
+    """
+    Registra uma função chamada antes de cada `render`, para métricas que só valem a
+    pena calcular quando alguém as lê (percorrer todos os canais, por exemplo).
+    """
+    _collectors.append(collect)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def render() -> str:
+    """
+    Todas as métricas no formato de texto do Prometheus (versão 0.0.4).
+
+    As métricas são atualizadas sem trava, cada série por uma única thread, e a leitura
+    copia os valores antes de formatar; uma série pode sair com uma observação de atraso.
+    """
+    for collect in list(_collectors):
+        collect()
+
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {_escape_help(metric.description)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+        for key, value in list(metric.values.items()):
+            if not isinstance(metric, Histogram):
+                lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_number(value)}")
+                continue
+
+            counts, total, count = list(value[0]), value[1], value[2]
+            cumulative = 0
+            for bound, bucket in zip(metric.buckets, counts):
+                cumulative += bucket
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, le)} {cumulative}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_number(total)}")
+            lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {count}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Optional
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+REQUEST_TIMEOUT = 5.0
+
+class MetricsServer:
+    """
+    Servidor HTTP mínimo, no próprio event loop do bot, que expõe `GET /metrics` no
+    formato de texto do Prometheus. Fica desligado a menos que `metrics_enabled` seja
+    verdadeiro e, por padrão, só escuta em 127.0.0.1.
+    """
+    def __init__(self):
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        config = get_config()
+        if self._server is not None or not config.metrics_enabled:
+            return
+
+        try:
+            self._server = await asyncio.start_server(self._handle, config.metrics_host, config.metrics_port)
+        except OSError as e:
+            logger.error(f"Erro ao abrir o endpoint de métricas em {config.metrics_host}:{config.metrics_port}: {e}")
+            return
+
+        logger.info(f"Métricas disponíveis em http://{config.metrics_host}:{config.metrics_port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            method, _, rest = head.decode("latin-1").partition(" ")
+            path = rest.partition(" ")[0].partition("?")[0]
+
+            if method not in ("GET", "HEAD"):
+                status, body = "405 Method Not Allowed", b""
+            elif path != "/metrics":
+                status, body = "404 Not Found", b""
+            else:
+                status, body = "200 OK", metrics.render().encode("utf-8")
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1")
+            )
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Erro ao responder a um pedido de métricas: {e}")
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+metrics_server = MetricsServer()